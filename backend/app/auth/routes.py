@@ -3,33 +3,101 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm # t
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User
-from app.schemas import UserCreate, UserResponse, Token
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models import User, RefreshToken
+from app.schemas import UserCreate, UserResponse, Token, AuthenticatedUser
+from app.services.cache import TTLCache
 from app.auth.security import (
-    get_password_hash,
-    verify_password,
+    password_hasher,
+    PasswordHasherBusy,
     create_access_token,
     SECRET_KEY,
     ALGORITHM,
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS,
+    REFRESH_TOKEN_PRUNE_MINUTES,
+    new_refresh_token,
+    hash_refresh_token,
 )
 from datetime import datetime, timedelta
 from jose import JWTError, jwt # type: ignore
+import os
+import time
+import uuid
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# user id -> AuthenticatedUser, so authenticated requests skip the users lookup
+AUTH_USER_CACHE_TTL_SECONDS = int(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "10000"))
+user_cache = TTLCache(AUTH_USER_CACHE_MAX_ENTRIES, AUTH_USER_CACHE_TTL_SECONDS)
+
+def invalidate_cached_user(user_id: int):
+    """Drop a user's cached record, e.g. after their credentials change."""
+    user_cache.pop(user_id)
+
+def issue_tokens(db: AsyncSession, user: User, family_id: str | None = None) -> dict:
+    """
+    Create an access token plus a new refresh token row (committed by the caller).
+    Rotations of the same login share `family_id`, so a replayed refresh token
+    can end the whole chain.
+    """
+    refresh_token = new_refresh_token()
+    now = datetime.utcnow()
+    db.add(RefreshToken(
+        user_id=user.id,
+        token_hash=hash_refresh_token(refresh_token),
+        family_id=family_id or uuid.uuid4().hex,
+        created_at=now,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    access_token = create_access_token(
+        data={"sub": user.email, "uid": user.id},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
+
+_last_refresh_token_prune: float | None = None
+
+async def _prune_refresh_tokens(db: AsyncSession, now: datetime) -> None:
+    """
+    Delete every expired refresh token row, at most once per
+    REFRESH_TOKEN_PRUNE_MINUTES (committed by the caller). Rotation revokes a
+    row but keeps it until it expires so a replay can still be recognised.
+    """
+    global _last_refresh_token_prune
+    if _last_refresh_token_prune is not None and \
+            time.monotonic() - _last_refresh_token_prune < REFRESH_TOKEN_PRUNE_MINUTES * 60:
+        return
+    _last_refresh_token_prune = time.monotonic()
+    result = await db.execute(delete(RefreshToken).where(RefreshToken.expires_at <= now))
+    if result.rowcount:
+        print(f"[auth.refresh] pruned {result.rowcount} expired refresh token(s)")
+
+def _invalid_refresh_token():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 # Get user by email
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(User).where(User.email == email))
 
 # Authenticate user
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.password_hash):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
+    if not user or not await password_hasher.verify(password, user.password_hash):
         return False
     return user
 
@@ -39,14 +107,14 @@ async def signup(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Validate input using Pydantic model
         user_data = UserCreate(email=email, password=password)
 
         # Check for existing user
-        existing_user = get_user_by_email(db, user_data.email)
+        existing_user = await get_user_by_email(db, user_data.email)
         if existing_user:
             return JSONResponse(
                 status_code=400,
@@ -54,7 +122,7 @@ async def signup(
             )
 
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         new_user = User(
             email=user_data.email,
             password_hash=hashed_password,
@@ -62,8 +130,7 @@ async def signup(
         )
 
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
 
         return jsonable_encoder(UserResponse(
             id=new_user.id,
@@ -76,6 +143,12 @@ async def signup(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             content={"detail": e.errors()}
         )
+    except PasswordHasherBusy as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": str(e)},
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -87,10 +160,10 @@ async def signup(
 async def login(
     request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        user = authenticate_user(db, form_data.username, form_data.password)
+        user = await authenticate_user(db, form_data.username, form_data.password)
         if not user:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -98,26 +171,30 @@ async def login(
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        # Update last login
+        # Update last login and drop this user's expired refresh tokens
         user.last_login = datetime.utcnow()
-        db.commit()
+        await db.execute(delete(RefreshToken).where(
+            RefreshToken.user_id == user.id,
+            RefreshToken.expires_at <= user.last_login
+        ))
 
-        # Create access token using the constant from security.py
-        access_token = create_access_token(
-            data={"sub": user.email},
-            expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        )
+        # Access token using the constant from security.py, plus a refresh token
+        tokens = issue_tokens(db, user)
+        await db.commit()
 
-        return {
-            "access_token": access_token,
-            "token_type": "bearer"
-        }
+        return tokens
 
     except ValidationError as e:
         return JSONResponse(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             content={"detail": e.errors()}
         )
+    except PasswordHasherBusy as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": str(e)},
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -126,10 +203,16 @@ async def login(
 
 # Get current user
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """
+    Resolve the bearer token to the calling user. Tokens carry the user id
+    ("uid"), so a cache hit needs no database query; tokens issued before
+    that claim existed fall back to the email lookup.
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
+        user_id = payload.get("uid")
         if email is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -143,7 +226,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = get_user_by_email(db, email=email)
+    cached = user_cache.get(user_id) if user_id is not None else None
+    if cached is not None and cached.email == email:
+        return cached
+
+    if user_id is not None:
+        user = await db.get(User, user_id)
+        if user is not None and user.email != email:
+            user = None
+    else:
+        user = await get_user_by_email(db, email=email)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -151,14 +243,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return user
+    current_user = AuthenticatedUser(id=user.id, email=user.email, created_at=user.created_at)
+    user_cache.set(user.id, current_user)
+    return current_user
 
 
 @router.post("/change-password")
 async def change_password(
     data: dict,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Allow authenticated users to change their password."""
     current_password = data.get("current_password")
@@ -167,12 +261,114 @@ async def change_password(
     if not current_password or not new_password:
         raise HTTPException(status_code=400, detail="current_password and new_password are required")
 
-    if not verify_password(current_password, current_user.password_hash):
+    user = await db.get(User, current_user.id)
+    try:
+        valid = user is not None and await password_hasher.verify(current_password, user.password_hash)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect current password")
 
     if len(new_password) < 5:
         raise HTTPException(status_code=400, detail="New password must be at least 5 characters")
 
-    current_user.password_hash = get_password_hash(new_password)
-    db.commit()
-    return {"success": True, "message": "Password updated successfully"}
\ No newline at end of file
+    try:
+        user.password_hash = await password_hasher.hash(new_password)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    # End every other session: revoke all refresh tokens and hand this client a fresh pair
+    await db.execute(update(RefreshToken).where(
+        RefreshToken.user_id == user.id,
+        RefreshToken.revoked_at.is_(None)
+    ).values(revoked_at=datetime.utcnow()))
+    tokens = issue_tokens(db, user)
+    await db.commit()
+    invalidate_cached_user(user.id)
+    return {"success": True, "message": "Password updated successfully", **tokens}
+
+
+@router.post("/refresh")
+async def refresh_access_token(data: dict, db: AsyncSession = Depends(get_async_db)):
+    """
+    Exchange a refresh token for a new access token and a new refresh token.
+    Each refresh token works once; presenting a rotated-out token again revokes
+    every token descended from the same login. No password check is involved.
+
+    Within REFRESH_TOKEN_REUSE_GRACE_SECONDS of its rotation a token is still
+    accepted once more while its session is alive, so a second tab refreshing
+    at the same time gets a new pair instead of logging the user out.
+    """
+    refresh_token = data.get("refresh_token")
+    if not refresh_token:
+        raise HTTPException(status_code=400, detail="refresh_token is required")
+
+    record = await db.scalar(select(RefreshToken).where(
+        RefreshToken.token_hash == hash_refresh_token(refresh_token)
+    ))
+    now = datetime.utcnow()
+    if record is None or record.expires_at <= now:
+        raise _invalid_refresh_token()
+    await _prune_refresh_tokens(db, now)
+
+    # Conditional revoke, so two concurrent refreshes can't both rotate the same token
+    rotated = await db.execute(update(RefreshToken).where(
+        RefreshToken.id == record.id,
+        RefreshToken.revoked_at.is_(None)
+    ).values(revoked_at=now))
+    if rotated.rowcount == 0:
+        rotated_at = record.revoked_at or now
+        live_token = await db.scalar(select(RefreshToken.id).where(
+            RefreshToken.family_id == record.family_id,
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now
+        ).limit(1))
+        allow_reuse = live_token is not None and now - rotated_at <= timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+        if allow_reuse:
+            # Conditional, so the grace reuse happens once; any further replay ends the session
+            reused = await db.execute(update(RefreshToken).where(
+                RefreshToken.id == record.id,
+                RefreshToken.reused_at.is_(None)
+            ).values(reused_at=now))
+            allow_reuse = reused.rowcount == 1
+        if allow_reuse:
+            user = await db.get(User, record.user_id)
+            if user is None:
+                raise _invalid_refresh_token()
+            tokens = issue_tokens(db, user, family_id=record.family_id)
+            await db.commit()
+            return tokens
+
+        print(f"[auth.refresh] reused refresh token for user {record.user_id}; revoking its session")
+        await db.execute(update(RefreshToken).where(
+            RefreshToken.family_id == record.family_id,
+            RefreshToken.revoked_at.is_(None)
+        ).values(revoked_at=now))
+        await db.commit()
+        raise _invalid_refresh_token()
+
+    user = await db.get(User, record.user_id)
+    if user is None:
+        await db.commit()
+        raise _invalid_refresh_token()
+
+    tokens = issue_tokens(db, user, family_id=record.family_id)
+    await db.commit()
+    return tokens
+
+
+@router.post("/logout")
+async def logout(data: dict, db: AsyncSession = Depends(get_async_db)):
+    """Revoke the session's refresh token chain; the access token simply expires."""
+    refresh_token = data.get("refresh_token")
+    if refresh_token:
+        record = await db.scalar(select(RefreshToken).where(
+            RefreshToken.token_hash == hash_refresh_token(refresh_token)
+        ))
+        if record is not None:
+            await db.execute(update(RefreshToken).where(
+                RefreshToken.family_id == record.family_id,
+                RefreshToken.revoked_at.is_(None)
+            ).values(revoked_at=datetime.utcnow()))
+            await db.commit()
+    return {"success": True}
\ No newline at end of file
@@ -1,4 +1,9 @@
+import asyncio
+import hashlib
 import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext # type: ignore
 from jose import jwt # type: ignore
 from datetime import datetime, timedelta, timezone
@@ -11,7 +16,14 @@ if not SECRET_KEY:
     raise ValueError("SECRET_KEY environment variable is required")
 
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+# Access tokens are short-lived; clients renew them with a rotating refresh token
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# A refresh token rotated this recently may be presented again (e.g. by a second
+# browser tab racing the first) without being treated as a replay
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_TOKEN_REUSE_GRACE_SECONDS", "30"))
+# Each process deletes expired refresh token rows at most this often
+REFRESH_TOKEN_PRUNE_MINUTES = float(os.getenv("REFRESH_TOKEN_PRUNE_MINUTES", "60"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -23,9 +35,89 @@ def get_password_hash(password: str):
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordHasherBusy(Exception):
+    """The password hashing queue is full; the request should be retried later (503)."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hash / verify on a dedicated thread pool so a burst of logins
+    doesn't stall the event loop. bcrypt releases the GIL while hashing, so
+    threads give real parallelism. At most `workers + max_queue` calls are
+    admitted at once; beyond that PasswordHasherBusy is raised instead of
+    letting the backlog grow. workers=0 hashes inline on the event loop.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt") if workers > 0 else None
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy("Too many concurrent password checks, retry shortly")
+
+        queued_at = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started - queued_at, time.perf_counter() - started
+
+        self._pending += 1
+        try:
+            result, waited, took = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self._pending -= 1
+        self.completed += 1
+        self.wait_seconds += waited
+        self.hash_seconds += took
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._pending,
+            "queued": max(0, self._pending - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "avg_hash_ms": round(self.hash_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+# Singleton used by the auth routes
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
 # Create JWT token
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+# Refresh tokens are random, so a fast hash is enough to keep them unusable if the table leaks
+def new_refresh_token() -> str:
+    return secrets.token_urlsafe(48)
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
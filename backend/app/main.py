@@ -1,20 +1,36 @@
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI # type: ignore
 from fastapi.middleware.cors import CORSMiddleware # type: ignore
 
-from app.auth.routes import router as auth_router
+from app.auth.routes import router as auth_router, user_cache
+from app.auth.security import password_hasher
 from app.routes.roadmap import router as roadmap_router
 from app.routes.quizzes import router as quizzes_router
 from app.database import Base, engine
+from app.services.jobs import jobs_service
+from app.services.llm import llm_service
+from app.services.quiz_pool import pool_stats
+from app.services.recommendations import job_recommendations
+from app.services.roadmap_jobs import roadmap_job_queue
 
 load_dotenv()
 
 # Initialize DB tables
 Base.metadata.create_all(bind=engine)
 
+# Background roadmap workers and the job index ingester live for the lifetime of the app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await roadmap_job_queue.start()
+    await jobs_service.start()
+    yield
+    await jobs_service.stop()
+    await roadmap_job_queue.stop()
+
 # FastAPI App
-app = FastAPI(title="LearnWise API")
+app = FastAPI(title="LearnWise API", lifespan=lifespan)
 
 # CORS middleware — restrict to known frontend origin
 FRONTEND_ORIGIN = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")
@@ -36,3 +52,17 @@ app.include_router(quizzes_router, prefix="/api/quizzes")
 @app.get("/")
 def health_check():
     return {"status": "ok", "message": "LearnWise API is running"}
+
+
+# Cache / pool counters for capacity sizing
+@app.get("/api/metrics")
+def metrics():
+    return {
+        "llm_roadmap_cache": llm_service.roadmap_cache.stats(),
+        "auth_user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "jobs_cache": jobs_service.stats(),
+        "job_recommendations": job_recommendations.stats(),
+        "quiz_pool": dict(pool_stats),
+        "roadmap_jobs": roadmap_job_queue.stats(),
+    }
@@ -0,0 +1,129 @@
+"""
+app/migrations.py
+
+Idempotent schema upgrades for existing databases.
+`Base.metadata.create_all` creates missing tables but never alters existing
+ones, so columns added to existing tables are applied here on startup.
+Statements run on both SQLite and PostgreSQL; the few that need
+dialect-specific JSON functions branch on `postgres`.
+"""
+from sqlalchemy import bindparam, inspect, text
+
+
+def _add_column(conn, table: str, column: str, ddl: str) -> bool:
+    """Add `column` to `table` unless it already exists. Returns True if added."""
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column in existing:
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    print(f"[migrations] added {table}.{column}")
+    return True
+
+
+def _create_index(conn, name: str, table: str, columns: str, unique: bool = False) -> None:
+    conn.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def _dedupe_quiz_attempts(conn) -> None:
+    """Fold duplicate (user_id, roadmap_id, node_id) attempt rows into the oldest one."""
+    rows = conn.execute(text(
+        "SELECT id, user_id, roadmap_id, node_id, attempts, best_score, best_total, passed "
+        "FROM quiz_attempts WHERE (user_id, roadmap_id, node_id) IN ("
+        "SELECT user_id, roadmap_id, node_id FROM quiz_attempts "
+        "GROUP BY user_id, roadmap_id, node_id HAVING COUNT(*) > 1) ORDER BY id"
+    )).mappings().all()
+    groups: dict[tuple, list] = {}
+    for row in rows:
+        groups.setdefault((row["user_id"], row["roadmap_id"], row["node_id"]), []).append(row)
+    for keep, *duplicates in groups.values():
+        scored = [r for r in (keep, *duplicates) if r["best_score"] is not None]
+        best = max(scored, key=lambda r: r["best_score"] / (r["best_total"] or 1), default=keep)
+        conn.execute(text(
+            "UPDATE quiz_attempts SET attempts = :attempts, best_score = :best_score, "
+            "best_total = :best_total, passed = :passed WHERE id = :id"
+        ), {
+            "id": keep["id"],
+            "attempts": sum(r["attempts"] or 0 for r in (keep, *duplicates)),
+            "best_score": best["best_score"],
+            "best_total": best["best_total"],
+            "passed": any(r["passed"] for r in (keep, *duplicates)),
+        })
+        conn.execute(text("DELETE FROM quiz_attempts WHERE id IN :ids").bindparams(
+            bindparam("ids", expanding=True)), {"ids": [r["id"] for r in duplicates]})
+    if groups:
+        print(f"[migrations] merged duplicate quiz_attempts for {len(groups)} node(s)")
+
+
+def _dedupe_quiz_templates(conn) -> None:
+    """Keep only the most recently created template per (user_id, roadmap_id, node_id)."""
+    result = conn.execute(text(
+        "DELETE FROM quiz_templates WHERE id NOT IN ("
+        "SELECT MAX(id) FROM quiz_templates GROUP BY user_id, roadmap_id, node_id)"
+    ))
+    if result.rowcount:
+        print(f"[migrations] removed {result.rowcount} duplicate quiz_templates row(s)")
+
+
+def run_migrations(engine) -> None:
+    postgres = engine.dialect.name == "postgresql"
+    with engine.begin() as conn:
+        # Quiz templates point at a shared quiz pool entry
+        _add_column(conn, "quiz_templates", "pool_entry_id", "INTEGER REFERENCES quiz_pool(id)")
+
+        # Denormalized progress counters, backfilled from the JSON columns
+        added_total = _add_column(conn, "comprehensive_roadmaps", "total_nodes", "INTEGER NOT NULL DEFAULT 0")
+        added_completed = _add_column(conn, "comprehensive_roadmaps", "completed_nodes", "INTEGER NOT NULL DEFAULT 0")
+        if added_total or added_completed:
+            json_len = "jsonb_array_length" if postgres else "json_array_length"
+            conn.execute(text(
+                "UPDATE comprehensive_roadmaps SET "
+                f"total_nodes = COALESCE({json_len}(nodes), 0), "
+                "completed_nodes = COALESCE(json_array_length(marked_nodes), 0)"
+            ))
+
+        # Completion ratio stored as an integer so the progress sort can walk an index;
+        # it replaces the completed_nodes index, which couldn't serve the ratio order
+        if _add_column(conn, "comprehensive_roadmaps", "progress_permille", "INTEGER NOT NULL DEFAULT 0"):
+            conn.execute(text(
+                "UPDATE comprehensive_roadmaps SET progress_permille = completed_nodes * 1000 / "
+                "CASE WHEN total_nodes > 1 THEN total_nodes ELSE 1 END"
+            ))
+        conn.execute(text("DROP INDEX IF EXISTS ix_comprehensive_roadmaps_user_progress"))
+        _create_index(conn, "ix_comprehensive_roadmaps_user_permille", "comprehensive_roadmaps",
+                      "user_id, is_completed, progress_permille, id")
+
+        # Node progress moved out of the marked_nodes JSON; seed the table once
+        if conn.execute(text("SELECT 1 FROM roadmap_node_progress LIMIT 1")).first() is None:
+            if postgres:
+                conn.execute(text(
+                    "INSERT INTO roadmap_node_progress (roadmap_id, node_id, completed, completed_at, updated_at) "
+                    "SELECT r.id, m.value, true, COALESCE(r.completed_at, r.updated_at), r.updated_at "
+                    "FROM comprehensive_roadmaps r, json_array_elements_text(r.marked_nodes) m(value) "
+                    "WHERE r.marked_nodes IS NOT NULL "
+                    "ON CONFLICT DO NOTHING"
+                ))
+            else:
+                conn.execute(text(
+                    "INSERT OR IGNORE INTO roadmap_node_progress (roadmap_id, node_id, completed, completed_at, updated_at) "
+                    "SELECT r.id, m.value, 1, COALESCE(r.completed_at, r.updated_at), r.updated_at "
+                    "FROM comprehensive_roadmaps r, json_each(r.marked_nodes) m "
+                    "WHERE r.marked_nodes IS NOT NULL"
+                ))
+
+        # Hot lookups: roadmap listings and the per-node quiz rows. The quiz tuples
+        # become unique so submits can upsert; existing duplicates are folded first
+        _create_index(conn, "ix_comprehensive_roadmaps_user_recent", "comprehensive_roadmaps",
+                      "user_id, is_completed, id")
+        existing = {i["name"] for i in inspect(conn).get_indexes("quiz_attempts")}
+        if "uq_quiz_attempts_user_roadmap_node" not in existing:
+            _dedupe_quiz_attempts(conn)
+            _create_index(conn, "uq_quiz_attempts_user_roadmap_node", "quiz_attempts",
+                          "user_id, roadmap_id, node_id", unique=True)
+        existing = {i["name"] for i in inspect(conn).get_indexes("quiz_templates")}
+        if "uq_quiz_templates_user_roadmap_node" not in existing:
+            _dedupe_quiz_templates(conn)
+            _create_index(conn, "uq_quiz_templates_user_roadmap_node", "quiz_templates",
+                          "user_id, roadmap_id, node_id", unique=True)
+
+        # A rotated refresh token may be presented once more within the grace window
+        _add_column(conn, "refresh_tokens", "reused_at", "TIMESTAMP")
@@ -1,8 +1,20 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON, Boolean, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 from app.database import Base
 from sqlalchemy.orm import relationship
 
+# JSON on SQLite, JSONB (indexable, binary) on PostgreSQL
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
+def _gin_index(table: str, column: str) -> Index:
+    """jsonb_path_ops GIN index, created on PostgreSQL only."""
+    return Index(
+        f"ix_{table}_{column}_gin", column,
+        postgresql_using="gin", postgresql_ops={column: "jsonb_path_ops"}
+    ).ddl_if(dialect="postgresql")
+
 
 class User(Base):
     __tablename__ = "users"
@@ -23,11 +35,14 @@ class ComprehensiveRoadmap(Base):
     timeframe = Column(String)
     current_knowledge = Column(String)
     target_level = Column(String)
-    content = Column(JSON)          # Stores LLM-generated mermaid + descriptions
-    nodes = Column(JSON, default=list)   # Graph structure nodes
-    edges = Column(JSON, default=list)   # Graph structure edges
-    node_desc = Column(JSON, default=dict)   # Node descriptions
-    marked_nodes = Column(JSON, default=list)  # Completed node list
+    content = Column(JSONDocument)          # Stores LLM-generated mermaid + descriptions
+    nodes = Column(JSONDocument, default=list)   # Graph structure nodes
+    edges = Column(JSONDocument, default=list)   # Graph structure edges
+    node_desc = Column(JSONDocument, default=dict)   # Node descriptions
+    marked_nodes = Column(JSON, default=list)  # Legacy completed node list; progress now lives in roadmap_node_progress
+    total_nodes = Column(Integer, default=0, nullable=False)      # len(nodes), kept in sync on write
+    completed_nodes = Column(Integer, default=0, nullable=False)  # completed roadmap_node_progress rows, kept in sync on write
+    progress_permille = Column(Integer, default=0, nullable=False)  # completed_nodes * 1000 // total_nodes, kept in sync on write
     is_completed = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
@@ -35,6 +50,53 @@ class ComprehensiveRoadmap(Base):
 
     user = relationship("User", backref="roadmaps")
 
+    __table_args__ = (
+        Index("ix_comprehensive_roadmaps_user_permille", "user_id", "is_completed", "progress_permille", "id"),
+        Index("ix_comprehensive_roadmaps_user_recent", "user_id", "is_completed", "id"),
+        *(_gin_index("comprehensive_roadmaps", column) for column in ("content", "nodes", "edges", "node_desc")),
+    )
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    token_hash = Column(String, unique=True, index=True)   # sha256 of the opaque token
+    family_id = Column(String, index=True)   # shared by every rotation of one login
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime)
+    revoked_at = Column(DateTime, nullable=True)
+    reused_at = Column(DateTime, nullable=True)   # set by the one reuse allowed after rotation
+
+
+class RoadmapNodeProgress(Base):
+    __tablename__ = "roadmap_node_progress"
+
+    roadmap_id = Column(Integer, ForeignKey("comprehensive_roadmaps.id"), primary_key=True)
+    node_id = Column(String, primary_key=True)
+    completed = Column(Boolean, default=False, nullable=False)
+    completed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class RoadmapJob(Base):
+    __tablename__ = "roadmap_jobs"
+
+    id = Column(String, primary_key=True)   # uuid4 hex, returned to the client
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String, default="queued", index=True)  # queued | generating | enriching | completed | failed
+    params = Column(JSON)                   # creation form fields
+    mermaid = Column(String, nullable=True)
+    nodes = Column(JSON, nullable=True)     # set once generation finishes
+    edges = Column(JSON, nullable=True)
+    descriptions = Column(JSON, default=dict)  # filled in as enrichment progresses
+    roadmap_id = Column(Integer, ForeignKey("comprehensive_roadmaps.id"), nullable=True)
+    attempts = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 
 class QuizAttempt(Base):
     __tablename__ = "quiz_attempts"
@@ -53,6 +115,10 @@ class QuizAttempt(Base):
     user = relationship("User", backref="quiz_attempts")
     roadmap = relationship("ComprehensiveRoadmap", backref="quiz_attempts")
 
+    __table_args__ = (
+        Index("uq_quiz_attempts_user_roadmap_node", "user_id", "roadmap_id", "node_id", unique=True),
+    )
+
 
 class QuizTemplate(Base):
     __tablename__ = "quiz_templates"
@@ -61,9 +127,48 @@ class QuizTemplate(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     roadmap_id = Column(Integer, ForeignKey("comprehensive_roadmaps.id"))
     node_id = Column(String)
-    quiz_json = Column(JSON)
+    quiz_json = Column(JSON)        # Legacy per-user quiz; new templates point at the pool
+    pool_entry_id = Column(Integer, ForeignKey("quiz_pool.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = relationship("User", backref="quiz_templates")
     roadmap = relationship("ComprehensiveRoadmap", backref="quiz_templates")
+
+    __table_args__ = (
+        Index("uq_quiz_templates_user_roadmap_node", "user_id", "roadmap_id", "node_id", unique=True),
+    )
+
+
+class QuizPoolEntry(Base):
+    __tablename__ = "quiz_pool"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pool_key = Column(String, index=True)   # normalized topic|skill|level|difficulty
+    topic = Column(String)
+    skill = Column(String, nullable=True)
+    level = Column(String, nullable=True)
+    difficulty = Column(String)
+    quiz_json = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class JobRecommendation(Base):
+    """Precomputed job recommendations per user, refreshed in the background."""
+    __tablename__ = "job_recommendations"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    skills = Column(JSON, default=list)
+    completed_skills = Column(JSON, default=list)
+    jobs = Column(JSON, default=list)
+    error = Column(String, nullable=True)      # last refresh failure, if any
+    computed_at = Column(DateTime)
+
+
+class ResourceCacheEntry(Base):
+    __tablename__ = "resource_cache"
+
+    cache_key = Column(String, primary_key=True)   # "<kind>:<normalized query>"
+    links = Column(JSON, default=list)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
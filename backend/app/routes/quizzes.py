@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import case, false, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_async_db, dialect_insert
 from app.auth.routes import get_current_user
-from app.services.llm import llm_service
-from app.models import ComprehensiveRoadmap, QuizAttempt, QuizTemplate
+from app.services.quiz_pool import get_pooled_quiz
+from app.services.progress import set_node_progress, refresh_counters
+from app.models import ComprehensiveRoadmap, QuizAttempt, QuizTemplate, QuizPoolEntry
 from datetime import datetime
 
 router = APIRouter()
@@ -14,7 +16,7 @@ router = APIRouter()
 async def generate_quiz(
     data: dict,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         roadmap_id = data.get("roadmap_id")
@@ -25,10 +27,10 @@ async def generate_quiz(
         if not roadmap_id or not node_id:
             raise HTTPException(status_code=400, detail="roadmap_id and node_id are required")
 
-        roadmap = db.query(ComprehensiveRoadmap).filter(
+        roadmap = await db.scalar(select(ComprehensiveRoadmap).where(
             ComprehensiveRoadmap.id == roadmap_id,
             ComprehensiveRoadmap.user_id == current_user.id
-        ).first()
+        ))
 
         if not roadmap:
             raise HTTPException(status_code=404, detail="Roadmap not found")
@@ -47,40 +49,54 @@ async def generate_quiz(
         if not topic:
             raise HTTPException(status_code=400, detail="Unable to determine topic for quiz")
 
-        # Check if a cached quiz template exists for this user/roadmap/node
-        quiz_template = db.query(QuizTemplate).filter(
+        # Check if a quiz template exists for this user/roadmap/node
+        quiz_template = await db.scalar(select(QuizTemplate).where(
             QuizTemplate.user_id == current_user.id,
             QuizTemplate.roadmap_id == roadmap_id,
             QuizTemplate.node_id == node_id
-        ).first()
-
-        # Return cached quiz UNLESS the user explicitly wants fresh questions
-        if quiz_template and quiz_template.quiz_json and not force_new:
-            return {"success": True, "quiz": quiz_template.quiz_json}
-
-        # Generate new questions from LLM
-        llm_resp = await llm_service.generate_quiz_for_topic(topic, skill=roadmap.skill, level=roadmap.target_level)
-
-        if not llm_resp.get("success"):
-            raise HTTPException(status_code=500, detail=llm_resp.get("error") or "LLM failed to generate quiz")
-
-        quiz_data = llm_resp.get("data")
-
-        # Persist / overwrite QuizTemplate record
-        if quiz_template:
-            quiz_template.quiz_json = quiz_data
-            quiz_template.updated_at = datetime.utcnow()
-        else:
-            quiz_template = QuizTemplate(
-                user_id=current_user.id,
-                roadmap_id=roadmap_id,
-                node_id=node_id,
-                quiz_json=quiz_data,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            db.add(quiz_template)
-        db.commit()
+        ))
+
+        # Return the user's current quiz UNLESS they explicitly want fresh questions
+        if quiz_template and not force_new:
+            if quiz_template.pool_entry_id:
+                entry = await db.get(QuizPoolEntry, quiz_template.pool_entry_id)
+                if entry and entry.quiz_json:
+                    return {"success": True, "quiz": entry.quiz_json}
+            elif quiz_template.quiz_json:
+                return {"success": True, "quiz": quiz_template.quiz_json}
+
+        # Pick a variant from the shared pool; the LLM is only called when the pool needs one
+        pooled = await get_pooled_quiz(
+            db,
+            topic,
+            skill=roadmap.skill,
+            level=roadmap.target_level,
+            exclude_entry_id=quiz_template.pool_entry_id if quiz_template else None,
+            force_new=force_new
+        )
+
+        if not pooled.get("success"):
+            raise HTTPException(status_code=500, detail=pooled.get("error") or "LLM failed to generate quiz")
+
+        entry = pooled["data"]
+        quiz_data = entry.quiz_json
+
+        # Point the user's QuizTemplate at the pooled entry (upsert on the unique node tuple)
+        now = datetime.utcnow()
+        stmt = dialect_insert(db)(QuizTemplate).values(
+            user_id=current_user.id,
+            roadmap_id=roadmap_id,
+            node_id=node_id,
+            pool_entry_id=entry.id,
+            created_at=now,
+            updated_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QuizTemplate.user_id, QuizTemplate.roadmap_id, QuizTemplate.node_id],
+            set_={"pool_entry_id": entry.id, "quiz_json": None, "updated_at": now}
+        )
+        await db.execute(stmt)
+        await db.commit()
 
         return {"success": True, "quiz": quiz_data}
 
@@ -91,13 +107,13 @@ async def generate_quiz(
 
 
 @router.get('/attempts')
-async def get_attempts(roadmap_id: int, node_id: str, current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_attempts(roadmap_id: int, node_id: str, current_user = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     try:
-        record = db.query(QuizAttempt).filter(
+        record = await db.scalar(select(QuizAttempt).where(
             QuizAttempt.user_id == current_user.id,
             QuizAttempt.roadmap_id == roadmap_id,
             QuizAttempt.node_id == node_id
-        ).first()
+        ))
 
         if not record:
             return {"success": True, "data": {"attempts": 0, "best_score": None, "best_total": None, "passed": False}}
@@ -111,7 +127,7 @@ async def get_attempts(roadmap_id: int, node_id: str, current_user = Depends(get
 async def submit_quiz(
     data: dict,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         print("[quizzes.submit] payload:", data)
@@ -124,10 +140,10 @@ async def submit_quiz(
         if not roadmap_id or not node_id:
             raise HTTPException(status_code=400, detail="roadmap_id and node_id are required")
 
-        roadmap = db.query(ComprehensiveRoadmap).filter(
+        roadmap = await db.scalar(select(ComprehensiveRoadmap).where(
             ComprehensiveRoadmap.id == roadmap_id,
             ComprehensiveRoadmap.user_id == current_user.id
-        ).first()
+        ))
 
         if not roadmap:
             raise HTTPException(status_code=404, detail="Roadmap not found")
@@ -135,48 +151,48 @@ async def submit_quiz(
         # Determine pass threshold (80%)
         passed = (total > 0) and ((score / total) >= 0.8)
 
-        # Find existing record
-        record = db.query(QuizAttempt).filter(
-            QuizAttempt.user_id == current_user.id,
-            QuizAttempt.roadmap_id == roadmap_id,
-            QuizAttempt.node_id == node_id
-        ).first()
-
-        if record:
-            record.attempts = (record.attempts or 0) + 1
-            # update best score if this attempt is better
-            if (record.best_score is None) or (score / total > (record.best_score or 0) / (record.best_total or 1)):
-                record.best_score = score
-                record.best_total = total
-            record.passed = record.passed or passed
-            record.updated_at = datetime.utcnow()
-        else:
-            record = QuizAttempt(
-                user_id=current_user.id,
-                roadmap_id=roadmap_id,
-                node_id=node_id,
-                attempts=1,
-                best_score=score,
-                best_total=total,
-                passed=passed,
-                updated_at=datetime.utcnow()
-            )
-            db.add(record)
+        # Upsert on the unique (user_id, roadmap_id, node_id) index so concurrent
+        # submits update one row; the best score is compared as a ratio
+        now = datetime.utcnow()
+        stmt = dialect_insert(db)(QuizAttempt).values(
+            user_id=current_user.id,
+            roadmap_id=roadmap_id,
+            node_id=node_id,
+            attempts=1,
+            best_score=score,
+            best_total=total,
+            passed=passed,
+            updated_at=now
+        )
+        better = or_(
+            QuizAttempt.best_score.is_(None),
+            stmt.excluded.best_score * func.coalesce(func.nullif(QuizAttempt.best_total, 0), 1)
+            > QuizAttempt.best_score * stmt.excluded.best_total
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QuizAttempt.user_id, QuizAttempt.roadmap_id, QuizAttempt.node_id],
+            set_={
+                "attempts": func.coalesce(QuizAttempt.attempts, 0) + 1,
+                "best_score": case((better, stmt.excluded.best_score), else_=QuizAttempt.best_score),
+                "best_total": case((better, stmt.excluded.best_total), else_=QuizAttempt.best_total),
+                "passed": or_(func.coalesce(QuizAttempt.passed, false()), stmt.excluded.passed),
+                "updated_at": now,
+            }
+        )
+        await db.execute(stmt)
 
         # If passed, mark node as completed in roadmap
         if passed:
-            marked = list(roadmap.marked_nodes) if roadmap.marked_nodes else []
-            if node_id not in marked:
-                marked.append(node_id)
-                roadmap.marked_nodes = marked
-
-            # update nodes completion flag
-            if roadmap.nodes:
-                roadmap.nodes = [ {**n, "completed": n.get("id") in marked} for n in roadmap.nodes ]
+            await db.run_sync(set_node_progress, roadmap.id, node_id, True)
+            await db.run_sync(refresh_counters, roadmap)
 
         roadmap.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(record)
+        await db.commit()
+        record = await db.scalar(select(QuizAttempt).where(
+            QuizAttempt.user_id == current_user.id,
+            QuizAttempt.roadmap_id == roadmap_id,
+            QuizAttempt.node_id == node_id
+        ).execution_options(populate_existing=True))
         print(f"[quizzes.submit] saved attempt id={record.id} passed={record.passed} attempts={record.attempts}")
 
         return {"success": True, "attempt_id": record.id, "passed": record.passed, "score": score, "total": total, "attempts": record.attempts}
@@ -184,5 +200,5 @@ async def submit_quiz(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
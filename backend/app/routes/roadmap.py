@@ -1,30 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException 
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-import re
+from typing import Optional
+import json
 
-from app.database import get_db
-from app.models import ComprehensiveRoadmap
+from app.database import get_async_db, AsyncSessionLocal
+from app.models import ComprehensiveRoadmap, RoadmapJob
 from app.auth.routes import get_current_user
-from app.services.llm import llm_service
-from app.services.resources import get_website_links, get_video_links
+from app.services.roadmap_builder import build_roadmap, save_roadmap
+from app.services.roadmap_jobs import roadmap_job_queue, job_status, FORM_FIELDS
+from app.services.progress import set_node_progress, replace_progress, refresh_counters, completed_node_ids, with_progress
 from app.services.jobs import jobs_service
+from app.services.recommendations import job_recommendations, recommendation_payload
 
 router = APIRouter()
 
-def parse_mermaid_to_nodes(mermaid_code):
-    nodes = []
-    for line in mermaid_code.split('\n'):
-        if line.strip():
-            match = re.search(r'\[(\w+)\]\s+(.+)$', line)
-            if match:
-                nodes.append({
-                    'id': match.group(1),
-                    'text': match.group(2),
-                    'completed': False,
-                    'varName': match.group(1)
-                })
-    return nodes
+# Upper bound for ?limit= on the summary listings
+MAX_PAGE_SIZE = 100
 
 def parse_descriptions(desc_text):
     descriptions = {}
@@ -41,7 +35,7 @@ def parse_descriptions(desc_text):
 # async def generate_roadmap_content(
 #     data: dict,
 #     current_user = Depends(get_current_user),
-#     db: Session = Depends(get_db)
+#     db: AsyncSession = Depends(get_async_db)
 # ):
 #     try:
 #         content = await generate_roadmap(
@@ -58,150 +52,250 @@ def parse_descriptions(desc_text):
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=str(e))
 
+def _created_roadmap_payload(roadmap):
+    return {
+        "id": roadmap.id,
+        "skill": roadmap.skill,
+        "timeframe": roadmap.timeframe,
+        "current_knowledge": roadmap.current_knowledge,
+        "target_level": roadmap.target_level,
+        "content": roadmap.content,
+        "nodes": roadmap.nodes,
+        "edges": roadmap.edges,
+        "node_desc": roadmap.node_desc,
+        "marked_nodes": roadmap.marked_nodes,
+        "is_completed": roadmap.is_completed
+    }
+
+def _require_form_fields(data: dict):
+    missing = [k for k in FORM_FIELDS if not data.get(k)]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing fields: {', '.join(missing)}")
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
 @router.post("/create")
 async def create_roadmap(
     data: dict,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    # Hand the work to the background job queue and return a pollable job id
+    if data.get("background"):
+        _require_form_fields(data)
+        params = {k: data[k] for k in FORM_FIELDS}
+        params["force_new"] = bool(data.get("force_new", False))
+        job = await roadmap_job_queue.enqueue(db, current_user.id, params)
+        return JSONResponse(status_code=202, content={"success": True, "job": job_status(job)})
+
     try:
         print("\n=== Starting Roadmap Creation ===")
         print(f"Received data: {data}")
 
-        # Generate roadmap content using LLM
+        # Generate the outline and enrich nodes as they stream in from the LLM
         print("Generating roadmap content using LLM...")
-        llm_response = await llm_service.generate_roadmap_content(
+        generated = None
+        async for event, payload in build_roadmap(
             skill=data["skill"],
             timeframe=data["timeframe"],
             current_knowledge=data["current_knowledge"],
-            target_level=data["target_level"]
-        )
-        
-        if not llm_response["success"]:
-            raise HTTPException(status_code=500, detail=llm_response["error"])
-            
-        # Parse generated content
-        mermaid_content = llm_response["data"]["mermaid"]
-        
-        # Parse nodes from generated mermaid
-        nodes = parse_mermaid_to_nodes(mermaid_content)
+            target_level=data["target_level"],
+            # Skip the shared roadmap cache when the user explicitly wants a fresh roadmap
+            use_cache=not data.get("force_new", False)
+        ):
+            if event == "generated":
+                generated = payload
+
+        mermaid_content = generated["mermaid"]
+        nodes = generated["nodes"]
+        edges = generated["edges"]
+        descriptions = generated["descriptions"]
         print(f"\nParsed Nodes: {len(nodes)} nodes created")
-
-        # Generate descriptions and resources for each node
-        descriptions = {}
-        for node in nodes:
-            node_id = node["id"]
-            node_text = node["text"]
-            
-            # Skip getting resources for time-related nodes
-            if any(time_word in node_text.lower() for time_word in ['day', 'am','pm','morning','afternoon','night','week','hour', 'month', 'year']):
-                descriptions[node_id] = f"Time period: {node_text}"
-                continue
-            
-            # Get resources for the node, including the skill name in the search
-            # search_query = f"{data['skill']} {node_text}"
-            # websites = get_website_links(search_query)
-            # videos = get_video_links(search_query)
-            websites = get_website_links(node_text)
-            videos = get_video_links(node_text)
-
-            
-            # Format description to match NodeInfo.jsx expected format
-            description = f"Learn {node_text}"
-            
-            # Add YouTube links if available
-            if videos:
-                description += f"\nyoutube links: {', '.join(videos)}"
-            
-            # Add website links if available
-            if websites:
-                description += f"\nwebsite links: {', '.join(websites)}"
-            
-            descriptions[node_id] = description
-        
         print(f"Generated Descriptions: {len(descriptions)} descriptions created")
-
-        # Create edges based on mermaid hierarchy
-        edges = []
-        lines = mermaid_content.split('\n')
-        current_levels = {}
-        
-        for line in lines:
-            if not line.strip():
-                continue
-            level = line.count('#')
-            match = re.search(r'\[(\w+)\]', line)
-            if match:
-                node_id = match.group(1)
-                if level > 1:
-                    parent_level = level - 1
-                    if parent_level in current_levels:
-                        edges.append({
-                            'id': f'{current_levels[parent_level]}-{node_id}',
-                            'source': current_levels[parent_level],
-                            'target': node_id
-                        })
-                current_levels[level] = node_id
-        
         print(f"Created Edges: {len(edges)} edges created")
 
         print("\nCreating new roadmap in database...")
-        new_roadmap = ComprehensiveRoadmap(
-            user_id=current_user.id,
-            skill=data["skill"],
-            timeframe=data["timeframe"],
-            current_knowledge=data["current_knowledge"],
-            target_level=data["target_level"],
-            content={
-                'mermaid': mermaid_content,
-                'descriptions': descriptions
-            },
-            nodes=nodes,
-            edges=edges,
-            node_desc=descriptions,
-            marked_nodes=[],
-            is_completed=False
-        )
-        
-        db.add(new_roadmap)
-        db.commit()
-        db.refresh(new_roadmap)
+        new_roadmap = await db.run_sync(save_roadmap, current_user.id, data, mermaid_content, nodes, edges, descriptions)
         print(f"Roadmap created with ID: {new_roadmap.id}")
-        
+        job_recommendations.schedule(current_user.id)
+
         response_data = {
             "success": True,
-            "roadmap": {
-                "id": new_roadmap.id,
-                "skill": new_roadmap.skill,
-                "timeframe": new_roadmap.timeframe,
-                "current_knowledge": new_roadmap.current_knowledge,
-                "target_level": new_roadmap.target_level,
-                "content": new_roadmap.content,
-                "nodes": new_roadmap.nodes,
-                "edges": new_roadmap.edges,
-                "node_desc": new_roadmap.node_desc,
-                "marked_nodes": new_roadmap.marked_nodes,
-                "is_completed": new_roadmap.is_completed
-            }
+            "roadmap": _created_roadmap_payload(new_roadmap)
         }
         print("\n=== Roadmap Creation Completed ===")
         return response_data
     except Exception as e:
         print(f"\nError creating roadmap: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/create/stream")
+async def create_roadmap_stream(
+    data: dict,
+    current_user = Depends(get_current_user)
+):
+    """
+    Streaming variant of /create using server-sent events:
+      node     -> each node (and its parent edge) as its line streams from the LLM
+      nodes    -> all parsed nodes, edges and markmap once the outline is complete
+      resource -> one per node as its resource lookups complete
+      done     -> the persisted roadmap (same shape as /create)
+      error    -> {"detail": ...} if any stage fails
+    """
+    _require_form_fields(data)
+    user_id = current_user.id
+
+    async def events():
+        try:
+            generated = None
+            async for event, payload in build_roadmap(
+                skill=data["skill"],
+                timeframe=data["timeframe"],
+                current_knowledge=data["current_knowledge"],
+                target_level=data["target_level"],
+                use_cache=not data.get("force_new", False)
+            ):
+                if event == "generated":
+                    generated = payload
+                else:
+                    yield _sse(event, payload)
+
+            mermaid_content = generated["mermaid"]
+            nodes = generated["nodes"]
+            edges = generated["edges"]
+            descriptions = generated["descriptions"]
+
+            async with AsyncSessionLocal() as db:
+                new_roadmap = await db.run_sync(save_roadmap, user_id, data, mermaid_content, nodes, edges, descriptions)
+            job_recommendations.schedule(user_id)
+            yield _sse("done", {"success": True, "roadmap": _created_roadmap_payload(new_roadmap)})
+        except Exception as e:
+            print(f"\nError streaming roadmap creation: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/create/{job_id}")
+async def get_roadmap_job(
+    job_id: str,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Poll a background roadmap job; `roadmap_id` is set once it completes."""
+    job = await db.scalar(select(RoadmapJob).where(
+        RoadmapJob.id == job_id,
+        RoadmapJob.user_id == current_user.id
+    ))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, "job": job_status(job)}
+
+async def _list_roadmap_summaries(db: AsyncSession, user_id: int, is_completed: bool, limit: int, cursor: Optional[str], sort: str = "recent"):
+    """
+    Dashboard listing: scalar columns plus the stored node / completion
+    counters, so the nodes, edges and description JSON never leave the database.
+    Pages newest-first (or by progress with sort="progress"); pass the
+    returned `next_cursor` to get the next page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = select(
+        ComprehensiveRoadmap.id,
+        ComprehensiveRoadmap.skill,
+        ComprehensiveRoadmap.timeframe,
+        ComprehensiveRoadmap.target_level,
+        ComprehensiveRoadmap.current_knowledge,
+        ComprehensiveRoadmap.is_completed,
+        ComprehensiveRoadmap.created_at,
+        ComprehensiveRoadmap.updated_at,
+        ComprehensiveRoadmap.completed_at,
+        ComprehensiveRoadmap.total_nodes,
+        ComprehensiveRoadmap.completed_nodes,
+        ComprehensiveRoadmap.progress_permille,
+    ).where(
+        ComprehensiveRoadmap.user_id == user_id,
+        ComprehensiveRoadmap.is_completed == is_completed
+    )
+    if sort == "progress":
+        # Highest completion first, keyset-paged on the stored progress_permille
+        # with cursor "permille:id"; ix_comprehensive_roadmaps_user_permille
+        # serves both the filter and the order
+        if cursor:
+            try:
+                c_permille, c_id = (int(part) for part in cursor.split(":"))
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.where(or_(
+                ComprehensiveRoadmap.progress_permille < c_permille,
+                and_(
+                    ComprehensiveRoadmap.progress_permille == c_permille,
+                    ComprehensiveRoadmap.id < c_id
+                )
+            ))
+        query = query.order_by(
+            ComprehensiveRoadmap.progress_permille.desc(),
+            ComprehensiveRoadmap.id.desc()
+        )
+    else:
+        if cursor:
+            try:
+                query = query.where(ComprehensiveRoadmap.id < int(cursor))
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.order_by(ComprehensiveRoadmap.id.desc())
+    rows = (await db.execute(query.limit(limit + 1))).all()
+
+    roadmaps = []
+    for row in rows[:limit]:
+        roadmaps.append({
+            "id": row.id,
+            "skill": row.skill,
+            "timeframe": row.timeframe,
+            "target_level": row.target_level,
+            "current_knowledge": row.current_knowledge,
+            "is_completed": row.is_completed,
+            "total_nodes": row.total_nodes,
+            "completed_nodes": row.completed_nodes,
+            "completion_percentage": (row.completed_nodes / row.total_nodes) * 100 if row.total_nodes else 0,
+            "completed_at": row.completed_at.isoformat() if row.completed_at else None,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None
+        })
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = f"{last.progress_permille}:{last.id}" if sort == "progress" else str(last.id)
+    return {
+        "success": True,
+        "roadmaps": roadmaps,
+        "next_cursor": next_cursor
+    }
+
 @router.get("/ongoing")
 async def get_ongoing_roadmaps(
+    summary: bool = False,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    sort: str = "recent",
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        roadmaps = db.query(ComprehensiveRoadmap).filter(
+        if summary:
+            return await _list_roadmap_summaries(db, current_user.id, is_completed=False, limit=limit, cursor=cursor, sort=sort)
+
+        roadmaps = (await db.scalars(select(ComprehensiveRoadmap).where(
             ComprehensiveRoadmap.user_id == current_user.id,
             ComprehensiveRoadmap.is_completed == False
-        ).all()
+        ))).all()
         
+        marked = await db.run_sync(completed_node_ids, [roadmap.id for roadmap in roadmaps])
+
         # Serialize roadmaps
         serialized_roadmaps = []
         for roadmap in roadmaps:
@@ -211,12 +305,12 @@ async def get_ongoing_roadmaps(
                 "timeframe": roadmap.timeframe,
                 "target_level": roadmap.target_level,
                 "current_knowledge": roadmap.current_knowledge,
-                "nodes": roadmap.nodes or [],
+                "nodes": with_progress(roadmap.nodes, marked[roadmap.id]),
                 "edges": roadmap.edges or [],
                 "markmap": roadmap.content.get('mermaid', '') if roadmap.content else '',
                 "descriptions": roadmap.content.get('descriptions', {}) if roadmap.content else {},
                 "node_desc": roadmap.node_desc or {},
-                "marked_nodes": roadmap.marked_nodes or [],
+                "marked_nodes": marked[roadmap.id],
                 "is_completed": roadmap.is_completed,
                 "created_at": roadmap.created_at.isoformat() if roadmap.created_at else None,
                 "updated_at": roadmap.updated_at.isoformat() if roadmap.updated_at else None
@@ -226,21 +320,32 @@ async def get_ongoing_roadmaps(
             "success": True,
             "roadmaps": serialized_roadmaps
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error in get_ongoing_roadmaps:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/completed")
 async def get_completed_roadmaps(
+    summary: bool = False,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    sort: str = "recent",
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        roadmaps = db.query(ComprehensiveRoadmap).filter(
+        if summary:
+            return await _list_roadmap_summaries(db, current_user.id, is_completed=True, limit=limit, cursor=cursor, sort=sort)
+
+        roadmaps = (await db.scalars(select(ComprehensiveRoadmap).where(
             ComprehensiveRoadmap.user_id == current_user.id,
             ComprehensiveRoadmap.is_completed == True
-        ).all()
+        ))).all()
         
+        marked = await db.run_sync(completed_node_ids, [roadmap.id for roadmap in roadmaps])
+
         # Serialize roadmaps
         serialized_roadmaps = []
         for roadmap in roadmaps:
@@ -250,12 +355,12 @@ async def get_completed_roadmaps(
                 "timeframe": roadmap.timeframe,
                 "target_level": roadmap.target_level,
                 "current_knowledge": roadmap.current_knowledge,
-                "nodes": roadmap.nodes or [],
+                "nodes": with_progress(roadmap.nodes, marked[roadmap.id]),
                 "edges": roadmap.edges or [],
                 "markmap": roadmap.content.get('mermaid', '') if roadmap.content else '',
                 "descriptions": roadmap.content.get('descriptions', {}) if roadmap.content else {},
                 "node_desc": roadmap.node_desc or {},
-                "marked_nodes": roadmap.marked_nodes or [],
+                "marked_nodes": marked[roadmap.id],
                 "is_completed": roadmap.is_completed,
                 "completed_at": roadmap.completed_at.isoformat() if roadmap.completed_at else None,
                 "created_at": roadmap.created_at.isoformat() if roadmap.created_at else None,
@@ -266,6 +371,8 @@ async def get_completed_roadmaps(
             "success": True,
             "roadmaps": serialized_roadmaps
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error in get_completed_roadmaps:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -274,19 +381,20 @@ async def get_completed_roadmaps(
 async def get_roadmap(
     roadmap_id: int,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        roadmap = db.query(ComprehensiveRoadmap).filter(
+        roadmap = await db.scalar(select(ComprehensiveRoadmap).where(
             ComprehensiveRoadmap.id == roadmap_id,
             ComprehensiveRoadmap.user_id == current_user.id
-        ).first()
+        ))
 
         if not roadmap:
             raise HTTPException(status_code=404, detail="Roadmap not found")
 
         # Use node descriptions stored at creation time — no live API calls
         node_desc = roadmap.node_desc or {}
+        marked = (await db.run_sync(completed_node_ids, [roadmap.id]))[roadmap.id]
 
         serialized_roadmap = {
             "id": roadmap.id,
@@ -294,12 +402,12 @@ async def get_roadmap(
             "timeframe": roadmap.timeframe,
             "target_level": roadmap.target_level,
             "current_knowledge": roadmap.current_knowledge,
-            "nodes": roadmap.nodes or [],
+            "nodes": with_progress(roadmap.nodes, marked),
             "edges": roadmap.edges or [],
             "markmap": roadmap.content.get("mermaid", "") if roadmap.content else "",
             "descriptions": roadmap.content.get("descriptions", {}) if roadmap.content else {},
             "node_desc": node_desc,
-            "marked_nodes": roadmap.marked_nodes or [],
+            "marked_nodes": marked,
             "is_completed": roadmap.is_completed,
             "completed_at": roadmap.completed_at.isoformat() if roadmap.completed_at else None,
             "created_at": roadmap.created_at.isoformat() if roadmap.created_at else None,
@@ -316,84 +424,115 @@ async def mark_node(
     roadmap_id: int,
     data: dict,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        roadmap = db.query(ComprehensiveRoadmap).filter(
+        roadmap = await db.scalar(select(ComprehensiveRoadmap).where(
             ComprehensiveRoadmap.id == roadmap_id,
             ComprehensiveRoadmap.user_id == current_user.id
-        ).first()
+        ))
         
         if not roadmap:
             raise HTTPException(status_code=404, detail="Roadmap not found")
         
-        # Update marked nodes
-        marked_nodes = list(roadmap.marked_nodes) if roadmap.marked_nodes else []
-        node_id = data["node_id"]
-        is_marked = data["is_marked"]
-        
-        if is_marked and node_id not in marked_nodes:
-            marked_nodes.append(node_id)
-        elif not is_marked and node_id in marked_nodes:
-            marked_nodes.remove(node_id)
-        
-        # Update nodes completion status
-        nodes = list(roadmap.nodes)
-        for node in nodes:
-            if node["id"] == node_id:
-                node["completed"] = is_marked
-        
-        # Calculate completion percentage
-        total_nodes = len(nodes)
-        completed_nodes = len(marked_nodes)
-        completion_percentage = (completed_nodes / total_nodes) * 100 if total_nodes > 0 else 0
-        
-        # Set completion status based on percentage
-        is_completed = completion_percentage >= 100
-        
-        # Update roadmap
-        roadmap.marked_nodes = marked_nodes
-        roadmap.nodes = nodes
-        roadmap.is_completed = is_completed
-        if is_completed and not roadmap.completed_at:
-            roadmap.completed_at = datetime.utcnow()
-        roadmap.updated_at = datetime.utcnow()
-        
-        db.commit()
-        db.refresh(roadmap)
-        
-        return {
-            "success": True,
-            "data": {
-                "id": roadmap.id,
-                "nodes": roadmap.nodes,
-                "marked_nodes": roadmap.marked_nodes,
-                "is_completed": roadmap.is_completed,
-                "completion_percentage": completion_percentage,
-                "completed_at": roadmap.completed_at.isoformat() if roadmap.completed_at else None,
-                "updated_at": roadmap.updated_at.isoformat()
-            }
-        }
+        # Single-row upsert, then refresh the stored progress counters
+        await db.run_sync(set_node_progress, roadmap.id, data["node_id"], data["is_marked"])
+        return await _commit_marked_progress(db, roadmap)
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.put("/{roadmap_id}/mark-nodes")
+async def mark_nodes(
+    roadmap_id: int,
+    data: dict,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Batch variant of mark-node: {"operations": [{"node_id", "is_marked"}, ...]}
+    applied in one transaction. When a node appears more than once the last
+    operation wins. Returns the resulting progress once.
+    """
+    try:
+        operations = data.get("operations")
+        if not isinstance(operations, list) or not operations:
+            raise HTTPException(status_code=400, detail="operations must be a non-empty list")
+        latest = {}
+        for op in operations:
+            if not isinstance(op, dict) or "node_id" not in op or "is_marked" not in op:
+                raise HTTPException(status_code=400, detail="Each operation needs node_id and is_marked")
+            latest[op["node_id"]] = bool(op["is_marked"])
+
+        roadmap = await db.scalar(select(ComprehensiveRoadmap).where(
+            ComprehensiveRoadmap.id == roadmap_id,
+            ComprehensiveRoadmap.user_id == current_user.id
+        ))
+
+        if not roadmap:
+            raise HTTPException(status_code=404, detail="Roadmap not found")
+
+        for node_id, is_marked in latest.items():
+            await db.run_sync(set_node_progress, roadmap.id, node_id, is_marked)
+        return await _commit_marked_progress(db, roadmap)
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _commit_marked_progress(db: AsyncSession, roadmap):
+    """Refresh counters and completion state after node upserts, commit, and serialize."""
+    await db.run_sync(refresh_counters, roadmap)
+
+    # Calculate completion percentage
+    completion_percentage = (roadmap.completed_nodes / roadmap.total_nodes) * 100 if roadmap.total_nodes > 0 else 0
+
+    # Set completion status based on percentage
+    is_completed = completion_percentage >= 100
+    completion_changed = bool(roadmap.is_completed) != is_completed
+    roadmap.is_completed = is_completed
+    if is_completed and not roadmap.completed_at:
+        roadmap.completed_at = datetime.utcnow()
+    roadmap.updated_at = datetime.utcnow()
+
+    await db.commit()
+    if completion_changed:
+        # Completed skills rank first in the user's job recommendations
+        job_recommendations.schedule(roadmap.user_id)
+    marked = (await db.run_sync(completed_node_ids, [roadmap.id]))[roadmap.id]
+
+    return {
+        "success": True,
+        "data": {
+            "id": roadmap.id,
+            "nodes": with_progress(roadmap.nodes, marked),
+            "marked_nodes": marked,
+            "is_completed": roadmap.is_completed,
+            "completion_percentage": completion_percentage,
+            "completed_at": roadmap.completed_at.isoformat() if roadmap.completed_at else None,
+            "updated_at": roadmap.updated_at.isoformat()
+        }
+    }
+
 @router.put("/{roadmap_id}/progress")
 async def update_roadmap_progress(
     roadmap_id: int,
     data: dict,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         print(f"\n=== Updating Roadmap Progress ===")
         print(f"Roadmap ID: {roadmap_id}")
         print(f"Update Data: {data}")
         
-        roadmap = db.query(ComprehensiveRoadmap).filter(
+        roadmap = await db.scalar(select(ComprehensiveRoadmap).where(
             ComprehensiveRoadmap.id == roadmap_id,
             ComprehensiveRoadmap.user_id == current_user.id
-        ).first()
+        ))
         
         if not roadmap:
             raise HTTPException(status_code=404, detail="Roadmap not found")
@@ -401,16 +540,11 @@ async def update_roadmap_progress(
         # Update marked nodes list
         if "marked_nodes" in data:
             print(f"Updating marked nodes: {data['marked_nodes']}")
-            roadmap.marked_nodes = data["marked_nodes"]
-            
-            # Update nodes completion status
-            if roadmap.nodes:
-                roadmap.nodes = [
-                    {**node, "completed": node["id"] in data["marked_nodes"]}
-                    for node in roadmap.nodes
-                ]
+            await db.run_sync(replace_progress, roadmap.id, data["marked_nodes"])
+            await db.run_sync(refresh_counters, roadmap)
         
         # Update completion status
+        was_completed = bool(roadmap.is_completed)
         if "is_completed" in data:
             print(f"Updating completion status: {data['is_completed']}")
             roadmap.is_completed = data["is_completed"]
@@ -422,8 +556,10 @@ async def update_roadmap_progress(
         roadmap.updated_at = datetime.utcnow()
         
         print("Committing changes to database...")
-        db.commit()
-        db.refresh(roadmap)
+        await db.commit()
+        if bool(roadmap.is_completed) != was_completed:
+            job_recommendations.schedule(current_user.id)
+        marked = (await db.run_sync(completed_node_ids, [roadmap.id]))[roadmap.id]
         
         print("=== Update Successful ===\n")
         
@@ -431,8 +567,8 @@ async def update_roadmap_progress(
             "success": True,
             "data": {
                 "id": roadmap.id,
-                "nodes": roadmap.nodes,
-                "marked_nodes": roadmap.marked_nodes,
+                "nodes": with_progress(roadmap.nodes, marked),
+                "marked_nodes": marked,
                 "is_completed": roadmap.is_completed,
                 "completed_at": roadmap.completed_at.isoformat() if roadmap.completed_at else None,
                 "updated_at": roadmap.updated_at.isoformat()
@@ -440,25 +576,24 @@ async def update_roadmap_progress(
         }
     except Exception as e:
         print(f"Error updating roadmap: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/jobs/recommendations")
 async def get_job_recommendations(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get job recommendations based on ALL roadmaps (ongoing + completed).
+    Served from the user's precomputed recommendations, which are refreshed
+    in the background as roadmaps change and the job index is refreshed.
     If the user has no roadmaps at all, returns an empty list with a helpful message.
     """
     try:
-        # Use ALL roadmaps — ongoing and completed — so every user gets recommendations
-        all_roadmaps = db.query(ComprehensiveRoadmap).filter(
-            ComprehensiveRoadmap.user_id == current_user.id
-        ).all()
+        row = await job_recommendations.get(db, current_user.id)
 
-        if not all_roadmaps:
+        if row is None:
             return {
                 "success": True,
                 "jobs": [],
@@ -466,30 +601,10 @@ async def get_job_recommendations(
                 "message": "Start a roadmap to get personalised job recommendations, or search any skill below."
             }
 
-        # Prefer completed skills first, then add ongoing ones
-        completed_skills = [r.skill for r in all_roadmaps if r.is_completed]
-        ongoing_skills   = [r.skill for r in all_roadmaps if not r.is_completed]
-        # Deduplicate while preserving order
-        seen = set()
-        skills = []
-        for s in (completed_skills + ongoing_skills):
-            if s.lower() not in seen:
-                seen.add(s.lower())
-                skills.append(s)
-
-        job_response = await jobs_service.fetch_jobs_from_naukri(skills=skills, num_jobs=9)
-
-        if not job_response["success"]:
-            raise HTTPException(status_code=500, detail=job_response.get("error", "Failed to fetch jobs"))
+        if row.error and not row.jobs:
+            raise HTTPException(status_code=500, detail=row.error)
 
-        jobs = job_response["data"].get("jobs", [])
-        return {
-            "success": True,
-            "jobs": jobs,
-            "skills": skills,
-            # Keep backwards-compat key
-            "completed_skills": completed_skills,
-        }
+        return recommendation_payload(row)
 
     except HTTPException:
         raise
@@ -502,7 +617,7 @@ async def get_job_recommendations(
 async def search_jobs_by_skill(
     data: dict,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Free-form job search: user supplies any skill string.
@@ -523,6 +638,7 @@ async def search_jobs_by_skill(
             "success": True,
             "jobs": jobs,
             "skill": skill,
+            "cached": job_response.get("cached", False),
         }
     except HTTPException:
         raise
@@ -535,29 +651,31 @@ async def search_jobs_by_skill(
 async def delete_roadmap(
     roadmap_id: int,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a roadmap and all associated quiz data."""
     try:
-        roadmap = db.query(ComprehensiveRoadmap).filter(
+        roadmap = await db.scalar(select(ComprehensiveRoadmap).where(
             ComprehensiveRoadmap.id == roadmap_id,
             ComprehensiveRoadmap.user_id == current_user.id
-        ).first()
+        ))
 
         if not roadmap:
             raise HTTPException(status_code=404, detail="Roadmap not found")
 
-        # Cascade-delete quiz attempts and templates
-        from app.models import QuizAttempt, QuizTemplate
-        db.query(QuizAttempt).filter(QuizAttempt.roadmap_id == roadmap_id).delete()
-        db.query(QuizTemplate).filter(QuizTemplate.roadmap_id == roadmap_id).delete()
-        db.delete(roadmap)
-        db.commit()
+        # Cascade-delete node progress, quiz attempts and templates
+        from app.models import QuizAttempt, QuizTemplate, RoadmapNodeProgress
+        await db.execute(delete(RoadmapNodeProgress).where(RoadmapNodeProgress.roadmap_id == roadmap_id))
+        await db.execute(delete(QuizAttempt).where(QuizAttempt.roadmap_id == roadmap_id))
+        await db.execute(delete(QuizTemplate).where(QuizTemplate.roadmap_id == roadmap_id))
+        await db.delete(roadmap)
+        await db.commit()
+        job_recommendations.schedule(current_user.id)
 
         return {"success": True, "message": "Roadmap deleted"}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error deleting roadmap: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
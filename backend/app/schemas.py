@@ -17,9 +17,20 @@ class UserResponse(BaseModel):
         orm_mode = True
 
 
+class AuthenticatedUser(BaseModel):
+    """The caller resolved by get_current_user; cached in-process, so never attached to a session."""
+    id: int
+    email: str
+    created_at: Optional[datetime] = None
+
+    class Config:
+        frozen = True
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
 
 
 class TokenData(BaseModel):
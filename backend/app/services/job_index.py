@@ -0,0 +1,310 @@
+"""
+app/services/job_index.py
+
+Local job index: scraped listings kept in a SQLite FTS5 database (its own
+file, independent of DATABASE_URL) so job queries don't have to go live.
+  1. Scrapes are ingested incrementally, deduplicated by job_url and by
+     (title, company); listings older than the scrapers' 72h window are pruned
+  2. Searches match the query skills against title / company / description
+     and return BM25-ordered candidates as a jobs frame (see src.job_api),
+     which JobsService then scores as usual
+  3. Every live query is registered so the background ingester can keep it
+     warm; a query is "cold" until it has been ingested once
+  4. Several app processes may share the file: before scraping a due query
+     the ingester claims it with a conditional UPDATE (claimed_until), so
+     only one process scrapes it per refresh
+
+All methods are synchronous (sqlite3) — call them from an executor.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+import pandas as pd
+
+from src.job_api import JOB_FIELDS, SCORING_COLUMNS
+
+_BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+JOB_INDEX_PATH = os.getenv("JOB_INDEX_PATH", os.path.join(_BACKEND_ROOT, "job_index.db"))
+JOB_INDEX_MAX_AGE_HOURS = float(os.getenv("JOB_INDEX_MAX_AGE_HOURS", "72"))
+JOB_INDEX_CANDIDATES = int(os.getenv("JOB_INDEX_CANDIDATES", "200"))
+
+# Frame columns stored as-is next to job_url (which gets its own unique column)
+_STORED_COLUMNS = [c for c in JOB_FIELDS + SCORING_COLUMNS if c != "job_url"]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    job_url TEXT UNIQUE,
+    dedupe_key TEXT NOT NULL UNIQUE,
+    search_location TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    {", ".join(f"{column} TEXT" for column in _STORED_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_location_scraped ON jobs (search_location, scraped_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+    title, company, description, content='jobs', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_fts(rowid, title, company, description)
+    VALUES (new.id, new.title, new.company, new._full_description);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+    INSERT INTO jobs_fts(jobs_fts, rowid, title, company, description)
+    VALUES ('delete', old.id, old.title, old.company, old._full_description);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE OF title, company, _full_description ON jobs BEGIN
+    INSERT INTO jobs_fts(jobs_fts, rowid, title, company, description)
+    VALUES ('delete', old.id, old.title, old.company, old._full_description);
+    INSERT INTO jobs_fts(rowid, title, company, description)
+    VALUES (new.id, new.title, new.company, new._full_description);
+END;
+
+CREATE TABLE IF NOT EXISTS job_queries (
+    query_key TEXT PRIMARY KEY,
+    skills TEXT NOT NULL,
+    search_location TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    last_requested REAL,
+    last_ingested REAL,
+    claimed_until REAL
+);
+"""
+
+
+def query_key(skills: list[str], location: str | None) -> tuple[str, str]:
+    """(normalized skills, normalized location) for a job query."""
+    skill_part = "\n".join(sorted({s.strip().lower() for s in skills if s.strip()}))
+    return skill_part, (location or "India").strip().lower()
+
+
+def _fts_query(skills: list[str]) -> str:
+    """Any of the skills, each as a quoted FTS5 phrase."""
+    phrases = {s.strip().lower().replace('"', '""') for s in skills if s.strip()}
+    return " OR ".join(f'"{p}"' for p in sorted(phrases))
+
+
+class JobIndex:
+
+    def __init__(self, path: str = JOB_INDEX_PATH, max_age_hours: float = JOB_INDEX_MAX_AGE_HOURS,
+                 candidates: int = JOB_INDEX_CANDIDATES):
+        self.path = path
+        self.max_age_seconds = max_age_hours * 3600
+        self.candidates = candidates
+        self.enabled = True
+        self._ready = False
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.cold_misses = 0
+        self.ingested = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    try:
+                        conn.executescript(_SCHEMA)
+                        self._add_claim_column(conn)
+                    except sqlite3.OperationalError as e:
+                        # e.g. a Python build whose SQLite lacks FTS5: run without the index
+                        print(f"[job_index] disabled: {e}")
+                        self.enabled = False
+                        conn.close()
+                        raise
+                    self._ready = True
+        return conn
+
+    @staticmethod
+    def _add_claim_column(conn: sqlite3.Connection) -> None:
+        """Index files created before query claims lack job_queries.claimed_until."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(job_queries)")}
+        if "claimed_until" in columns:
+            return
+        try:
+            conn.execute("ALTER TABLE job_queries ADD COLUMN claimed_until REAL")
+        except sqlite3.OperationalError as e:
+            # Another process added it first
+            if "duplicate column" not in str(e):
+                raise
+
+    # ── ingestion ────────────────────────────────────────────────────────────
+
+    def ingest(self, frame: pd.DataFrame, location: str | None) -> int:
+        """Upsert a scraped jobs frame; returns the number of new listings."""
+        if not self.enabled or frame.empty:
+            return 0
+        search_location = query_key([], location)[1]
+        now = time.time()
+        frame = frame.reindex(columns=["job_url"] + _STORED_COLUMNS).fillna("")
+        dedupe_keys = frame["_title_lower"] + "\n" + frame["company"].str.lower()
+        job_urls = frame["job_url"].where(frame["job_url"] != "", None)
+        assignments = ", ".join(f"{column} = ?" for column in _STORED_COLUMNS)
+        placeholders = ", ".join("?" for _ in _STORED_COLUMNS)
+
+        added = 0
+        conn = self._connect()
+        try:
+            with conn:
+                rows = frame[_STORED_COLUMNS].itertuples(index=False, name=None)
+                for key, job_url, values in zip(dedupe_keys, job_urls, rows):
+                    # A known listing (same url, or same title + company) is refreshed in place
+                    updated = conn.execute(
+                        f"UPDATE OR IGNORE jobs SET {assignments}, job_url = COALESCE(?, job_url), "
+                        f"dedupe_key = ?, scraped_at = ?, search_location = ? "
+                        f"WHERE job_url = ? OR dedupe_key = ?",
+                        (*values, job_url, key, now, search_location, job_url, key)
+                    ).rowcount
+                    if not updated:
+                        added += conn.execute(
+                            f"INSERT OR IGNORE INTO jobs (job_url, dedupe_key, search_location, scraped_at, "
+                            f"{', '.join(_STORED_COLUMNS)}) VALUES (?, ?, ?, ?, {placeholders})",
+                            (job_url, key, search_location, now, *values)
+                        ).rowcount
+                conn.execute("DELETE FROM jobs WHERE scraped_at < ?", (now - self.max_age_seconds,))
+        finally:
+            conn.close()
+        self.ingested += added
+        return added
+
+    def register_query(self, skills: list[str], location: str | None) -> None:
+        """Record that a query was asked for, so the ingester keeps it warm."""
+        if not self.enabled:
+            return
+        skill_part, search_location = query_key(skills, location)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO job_queries (query_key, skills, search_location, requests, last_requested) "
+                    "VALUES (?, ?, ?, 1, ?) ON CONFLICT(query_key) DO UPDATE SET "
+                    "requests = requests + 1, last_requested = excluded.last_requested",
+                    (f"{skill_part}@{search_location}", skill_part, search_location, time.time())
+                )
+        finally:
+            conn.close()
+
+    def mark_ingested(self, skills: list[str], location: str | None) -> None:
+        if not self.enabled:
+            return
+        skill_part, search_location = query_key(skills, location)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO job_queries (query_key, skills, search_location, last_ingested) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT(query_key) DO UPDATE SET last_ingested = excluded.last_ingested",
+                    (f"{skill_part}@{search_location}", skill_part, search_location, time.time())
+                )
+        finally:
+            conn.close()
+
+    def due_queries(self, older_than_seconds: float, limit: int) -> list[tuple[list[str], str]]:
+        """Unclaimed registered queries not ingested for `older_than_seconds`, most requested first."""
+        if not self.enabled:
+            return []
+        now = time.time()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT skills, search_location FROM job_queries "
+                "WHERE requests > 0 AND (last_ingested IS NULL OR last_ingested < ?) "
+                "AND (claimed_until IS NULL OR claimed_until < ?) "
+                "ORDER BY requests DESC, last_requested DESC LIMIT ?",
+                (now - older_than_seconds, now, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [(skills.split("\n"), location) for skills, location in rows]
+
+    def claim_query(self, skills: list[str], location: str | None, older_than_seconds: float,
+                    lease_seconds: float) -> bool:
+        """
+        Take a due query for this process with one conditional UPDATE, so only
+        one process scrapes it. The claim lapses after `lease_seconds`; a
+        successful ingest makes the query not due anyway.
+        """
+        if not self.enabled:
+            return False
+        skill_part, search_location = query_key(skills, location)
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                claimed = conn.execute(
+                    "UPDATE job_queries SET claimed_until = ? WHERE query_key = ? "
+                    "AND (last_ingested IS NULL OR last_ingested < ?) "
+                    "AND (claimed_until IS NULL OR claimed_until < ?)",
+                    (now + lease_seconds, f"{skill_part}@{search_location}", now - older_than_seconds, now)
+                ).rowcount
+        finally:
+            conn.close()
+        return claimed == 1
+
+    # ── search ───────────────────────────────────────────────────────────────
+
+    def search(self, skills: list[str], location: str | None, min_results: int = 1) -> pd.DataFrame | None:
+        """
+        Candidate jobs for the query, best BM25 match first, as a jobs frame.
+        Returns None when the index is cold for this query: it was never
+        ingested and holds fewer than `min_results` matches.
+        """
+        if not self.enabled:
+            return None
+        match = _fts_query(skills)
+        if not match:
+            return None
+        skill_part, search_location = query_key(skills, location)
+        self.searches += 1
+        try:
+            conn = self._connect()
+        except sqlite3.OperationalError:
+            return None
+        try:
+            rows = conn.execute(
+                f"SELECT j.job_url, {', '.join('j.' + c for c in _STORED_COLUMNS)} FROM jobs_fts "
+                f"JOIN jobs j ON j.id = jobs_fts.rowid "
+                f"WHERE jobs_fts MATCH ? AND j.search_location = ? AND j.scraped_at >= ? "
+                f"ORDER BY bm25(jobs_fts, 5.0, 1.0, 1.0) LIMIT ?",
+                (match, search_location, time.time() - self.max_age_seconds, self.candidates)
+            ).fetchall()
+            ingested = conn.execute(
+                "SELECT last_ingested FROM job_queries WHERE query_key = ?",
+                (f"{skill_part}@{search_location}",)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        warm = ingested is not None and ingested[0] is not None and ingested[0] >= time.time() - self.max_age_seconds
+        if not warm and len(rows) < min_results:
+            self.cold_misses += 1
+            return None
+        return pd.DataFrame.from_records(rows, columns=["job_url"] + _STORED_COLUMNS).fillna("")
+
+    def stats(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {
+            "enabled": self.enabled,
+            "searches": self.searches,
+            "cold_misses": self.cold_misses,
+            "ingested": self.ingested,
+        }
+        if self.enabled and self._ready:
+            conn = self._connect()
+            try:
+                stats["jobs"] = conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+                stats["queries"] = conn.execute("SELECT COUNT(*) FROM job_queries").fetchone()[0]
+            finally:
+                conn.close()
+        return stats
+
+
+# Singleton used by JobsService
+job_index = JobIndex()
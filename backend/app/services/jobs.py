@@ -3,138 +3,316 @@ app/services/jobs.py
 
 Real job recommendation service — NO AI-generated fallback.
   1. Fetches concurrently from LinkedIn + Naukri via python-jobspy
-  2. Scores every job across four dimensions:
+  2. Scores every job across four dimensions (weights set via JOBS_WEIGHT_*):
        - Skill match     (40 %)
        - Title relevance (30 %)
        - Level match     (20 %)
        - Location bonus  (10 %)
-  3. Returns top-N ranked jobs — all with real job_url links
+     as one feature-matrix product, keeping the top-N with argpartition
+  3. Returns top-N ranked jobs — all with real job_url links; scraped rows
+     stay in a pandas frame and only the top-N become dicts
   4. If scrapers return nothing, raises a clear error (no fake data)
+  5. Ranked results are cached per (skills, location, levels) with
+     stale-while-revalidate: a stale entry is served immediately while one
+     background refresh runs; identical concurrent scrapes are shared
+  6. Listings come from the local job index when it is warm for the query;
+     live scrapes are ingested into it, and a background ingester re-scrapes
+     requested queries every JOB_INDEX_REFRESH_MINUTES
 """
 from __future__ import annotations
 
 import asyncio
-import re
 import sys
 import os
+import time
 import traceback
-from typing import Any
+from typing import Any, Awaitable, Callable
+
+import numpy as np
+import pandas as pd
 
 # ── locate the real scrapers ─────────────────────────────────────────────────
 _BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if _BACKEND_ROOT not in sys.path:
     sys.path.insert(0, _BACKEND_ROOT)
 
-from src.job_api import fetch_linkedin_jobs, fetch_naukri_jobs
+from src.job_api import fetch_linkedin_frame, fetch_naukri_frame, frame_to_jobs
+from src.skill_match import SkillMatcher, skill_matcher
+from app.services.cache import SingleFlight, TTLCache
+from app.services.job_index import job_index
 
 
 # ── Scoring helpers ───────────────────────────────────────────────────────────
+# Each helper scores a whole jobs frame (see src.job_api) and returns one
+# value per row.
 
-def _skill_score(job: dict, skills: list[str]) -> float:
+def _skill_scores(frame: pd.DataFrame, skills: list[str], matcher: SkillMatcher) -> np.ndarray:
     """0.0–1.0: fraction of queried skills found in description + title."""
     if not skills:
-        return 0.5
-    haystack = job.get("_full_description", "") + " " + job.get("_title_lower", "")
-    hits = sum(
-        1 for s in skills
-        if re.search(r'\b' + re.escape(s.lower()) + r'\b', haystack)
+        return np.full(len(frame), 0.5)
+    hits = np.fromiter(
+        (matcher.count(desc + " " + title)
+         for desc, title in zip(frame["_full_description"], frame["_title_lower"])),
+        dtype=float, count=len(frame)
     )
     return hits / len(skills)
 
 
-def _title_score(job: dict, skills: list[str]) -> float:
+def _title_scores(frame: pd.DataFrame, skills: list[str], matcher: SkillMatcher) -> np.ndarray:
     """1.0 if any skill keyword appears in the job title, else 0.2."""
-    title = job.get("_title_lower", "")
-    if not title or not skills:
-        return 0.3
-    for s in skills:
-        if re.search(r'\b' + re.escape(s.lower()) + r'\b', title):
-            return 1.0
-    return 0.2
-
+    titles = frame["_title_lower"]
+    if not skills:
+        return np.full(len(frame), 0.3)
+    hit = np.fromiter((bool(matcher.found(t)) for t in titles), dtype=bool, count=len(frame))
+    return np.where(titles.to_numpy() == "", 0.3, np.where(hit, 1.0, 0.2))
 
-def _level_score(job: dict, desired_levels: list[str] | None) -> float:
-    """0.0–1.0: seniority alignment between job and the user's target levels."""
-    if not desired_levels:
-        return 0.5
-    job_level = job.get("level", "").lower()
-    if any(w in job_level for w in ("senior", "lead", "principal")):
-        job_bucket = "senior"
-    elif any(w in job_level for w in ("entry", "junior", "intern", "fresher", "associate")):
-        job_bucket = "entry"
-    else:
-        job_bucket = "mid"
 
-    for dl in desired_levels:
+def _level_table(desired_levels: list[str] | None) -> dict[str, float] | None:
+    """Score per job seniority bucket for the user's target levels (the first level decides)."""
+    for dl in desired_levels or []:
         dl_l = dl.lower()
         if any(w in dl_l for w in ("senior", "master", "advanced")):
-            return {"senior": 1.0, "mid": 0.5, "entry": 0.1}[job_bucket]
+            return {"senior": 1.0, "mid": 0.5, "entry": 0.1}
         elif any(w in dl_l for w in ("beginner", "entry", "started", "get started")):
-            return {"entry": 1.0, "mid": 0.5, "senior": 0.2}[job_bucket]
+            return {"entry": 1.0, "mid": 0.5, "senior": 0.2}
         else:  # intermediate / mid
-            return {"mid": 1.0, "entry": 0.5, "senior": 0.5}[job_bucket]
-    return 0.5
+            return {"mid": 1.0, "entry": 0.5, "senior": 0.5}
+    return None
 
 
-def _location_score(job: dict, preferred_location: str | None) -> float:
+def _level_scores(frame: pd.DataFrame, desired_levels: list[str] | None) -> np.ndarray:
+    """0.0–1.0: seniority alignment between job and the user's target levels."""
+    table = _level_table(desired_levels)
+    if table is None:
+        return np.full(len(frame), 0.5)
+    return frame["_level_bucket"].map(table).fillna(0.5).to_numpy(dtype=float)
+
+
+def _location_scores(frame: pd.DataFrame, preferred_location: str | None) -> np.ndarray:
     if not preferred_location:
-        return 0.5
-    loc = (job.get("location") or "").lower()
-    return 1.0 if preferred_location.lower() in loc else 0.3
+        return np.full(len(frame), 0.5)
+    match = frame["location"].str.lower().str.contains(preferred_location.lower(), regex=False)
+    return np.where(match.to_numpy(dtype=bool), 1.0, 0.3)
 
 
-def _rank(job: dict, skills: list[str], levels: list[str] | None, location: str | None) -> float:
-    return (
-        0.40 * _skill_score(job, skills)
-        + 0.30 * _title_score(job, skills)
-        + 0.20 * _level_score(job, levels)
-        + 0.10 * _location_score(job, location)
-    )
+def _top_n(scores: np.ndarray, n: int) -> np.ndarray:
+    """
+    Row indices of the `n` best scores, best first — the same rows and order a
+    stable descending sort would give, but via argpartition (O(rows)) plus a
+    sort of just the selected rows.
+    """
+    if n >= len(scores):
+        candidates = np.arange(len(scores))
+    elif n <= 0:
+        return np.empty(0, dtype=np.intp)
+    else:
+        cutoff = scores[np.argpartition(-scores, n - 1)[:n]].min()
+        above = np.flatnonzero(scores > cutoff)
+        # Ties at the cutoff go to the earliest rows, as in a stable sort
+        candidates = np.concatenate([above, np.flatnonzero(scores == cutoff)[:n - len(above)]])
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
 
+class JobRanker:
+    """
+    Scores a jobs frame in one shot: a (jobs × 4) feature matrix of skill,
+    title, level and location scores times a weight vector, then partial
+    selection of the top-N rows.
+    """
 
-def _clean(job: dict) -> dict:
-    """Strip internal underscore fields before returning to the API."""
-    return {k: v for k, v in job.items() if not k.startswith("_")}
+    FEATURES = ("skills", "title", "level", "location")
+
+    def __init__(self, weights: tuple[float, float, float, float] = (0.40, 0.30, 0.20, 0.10)):
+        self.weights = np.asarray(weights, dtype=float)
+
+    def features(self, frame: pd.DataFrame, skills: list[str], levels: list[str] | None, location: str | None) -> np.ndarray:
+        matcher = skill_matcher(tuple(skills))    # one matcher for the whole batch
+        return np.column_stack([
+            _skill_scores(frame, skills, matcher),
+            _title_scores(frame, skills, matcher),
+            _level_scores(frame, levels),
+            _location_scores(frame, location),
+        ]) if len(frame) else np.empty((0, len(self.FEATURES)))
+
+    def rank(self, frame: pd.DataFrame, skills: list[str], levels: list[str] | None, location: str | None,
+             top_n: int) -> pd.DataFrame:
+        """Deduplicate by title+company and return the best `top_n` rows, best first, with `_score`."""
+        keys = pd.DataFrame({"title": frame["_title_lower"], "company": frame["company"].str.lower()})
+        frame = frame.loc[~keys.duplicated()].reset_index(drop=True)
+
+        # Rounded so jobs with equal feature scores tie exactly and keep scrape order
+        scores = np.round(self.features(frame, skills, levels, location) @ self.weights, 9)
+        best = _top_n(scores, top_n)
+        return frame.iloc[best].assign(_score=scores[best]).reset_index(drop=True)
+
+    def stats(self) -> dict[str, float]:
+        return {name: float(w) for name, w in zip(self.FEATURES, self.weights)}
 
 
 # ── Service ───────────────────────────────────────────────────────────────────
 
 class JobsService:
 
+    def __init__(self):
+        # Entries are served as-is while fresh, served *and* refreshed in the
+        # background while stale, and dropped once the TTL runs out
+        self.fresh_seconds = float(os.getenv("JOBS_CACHE_FRESH_SECONDS", str(15 * 60)))
+        self.results_cache = TTLCache(
+            max_entries=int(os.getenv("JOBS_CACHE_MAX_ENTRIES", "512")),
+            ttl=float(os.getenv("JOBS_CACHE_TTL_SECONDS", str(6 * 3600)))
+        )
+        self.ranker = JobRanker((
+            float(os.getenv("JOBS_WEIGHT_SKILLS", "0.40")),
+            float(os.getenv("JOBS_WEIGHT_TITLE", "0.30")),
+            float(os.getenv("JOBS_WEIGHT_LEVEL", "0.20")),
+            float(os.getenv("JOBS_WEIGHT_LOCATION", "0.10")),
+        ))
+        self._scrapes = SingleFlight()
+        # Local job index ingestion (see app/services/job_index.py)
+        self.refresh_seconds = float(os.getenv("JOB_INDEX_REFRESH_MINUTES", "60")) * 60
+        self.queries_per_cycle = int(os.getenv("JOB_INDEX_QUERIES_PER_CYCLE", "20"))
+        self.ingest_per_site = int(os.getenv("JOB_INDEX_RESULTS_PER_SITE", "50"))
+        self.ingest_delay = float(os.getenv("JOB_INDEX_SCRAPE_DELAY_SECONDS", "5"))
+        self._ingester: asyncio.Task | None = None
+        self._index_listeners: list[Callable[[], Awaitable[None]]] = []
+        self.index_served = 0
+        self.live_scrapes = 0
+        self.index_refreshes = 0
+        self._refreshes: dict[tuple, asyncio.Task] = {}
+        self.stale_hits = 0
+        self.background_refreshes = 0
+        self.scrape_failures = 0
+
+    @staticmethod
+    def _cache_key(skills: list[str], levels: list[str] | None, location: str | None, per_site: int) -> tuple:
+        return (
+            tuple(sorted({s.strip().lower() for s in skills if s.strip()})),
+            (location or "India").strip().lower(),
+            tuple(sorted({l.strip().lower() for l in levels or [] if l.strip()})),
+            per_site,
+        )
+
     async def fetch_jobs_from_naukri(
         self,
         skills: list[str],
         num_jobs: int = 9,
         levels: list[str] | None = None,
         location: str | None = "India",
+        use_cache: bool = True,
     ) -> dict[str, Any]:
         """
         Fetch real jobs from LinkedIn + Naukri, score them, return top-N.
         Never falls back to AI-generated data.
+
+        Results come from the shared cache when possible; `cached` / `stale`
+        in the response say how. `use_cache=False` always scrapes (and
+        refreshes the cache on success).
         """
         if not skills:
             return {"success": False, "error": "No skills provided."}
 
-        loop = asyncio.get_event_loop()
         per_site = max(num_jobs, 15)          # fetch more so scoring has better pool
+        key = self._cache_key(skills, levels, location, per_site)
+
+        if use_cache:
+            entry = self.results_cache.get(key)
+            if entry is not None:
+                fetched_at, ranked = entry
+                stale = time.monotonic() - fetched_at > self.fresh_seconds
+                if stale:
+                    self.stale_hits += 1
+                    self._refresh_in_background(key, skills, levels, location, per_site)
+                return {
+                    "success": True,
+                    "data": {"jobs": frame_to_jobs(ranked.head(num_jobs), skills)},
+                    "cached": True,
+                    "stale": stale,
+                }
+
+        result = await self._scrapes.do(
+            key, lambda: self._scrape_and_cache(key, skills, levels, location, per_site)
+        )
+        if not result["success"]:
+            return result
+        return {
+            "success": True,
+            "data": {"jobs": frame_to_jobs(result["ranked"].head(num_jobs), skills)},
+            "cached": False,
+            "stale": False,
+        }
+
+    def _refresh_in_background(self, key: tuple, skills, levels, location, per_site: int) -> None:
+        """Start one refresh for `key` unless a scrape for it is already running."""
+        if key in self._refreshes or key in self._scrapes:
+            return
+        self.background_refreshes += 1
+        task = asyncio.ensure_future(self._scrapes.do(
+            key, lambda: self._scrape_and_cache(key, skills, levels, location, per_site)
+        ))
+        # Keep a reference until done so the task isn't garbage collected mid-scrape
+        self._refreshes[key] = task
+        task.add_done_callback(lambda _t: self._refreshes.pop(key, None))
+
+    async def _scrape_and_cache(self, key: tuple, skills, levels, location, per_site: int) -> dict[str, Any]:
+        result = await self._scrape_and_rank(skills, levels, location, per_site)
+        if result["success"]:
+            self.results_cache.set(key, (time.monotonic(), result["ranked"]))
+        else:
+            # Failures aren't cached: a stale entry (if any) keeps being served
+            self.scrape_failures += 1
+        return result
+
+    async def _scrape_and_rank(self, skills, levels, location, per_site: int) -> dict[str, Any]:
+        """
+        Return the best `per_site` unique jobs as a frame, best first, under
+        `ranked` — from the local job index when it is warm for the query,
+        otherwise from a live scrape (which is then ingested).
+        """
+        loop = asyncio.get_event_loop()
+
+        try:
+            await loop.run_in_executor(None, job_index.register_query, skills, location)
+            indexed = await loop.run_in_executor(None, job_index.search, skills, location, per_site)
+        except Exception:
+            traceback.print_exc()
+            indexed = None
+        if indexed is not None and not indexed.empty:
+            self.index_served += 1
+            # Candidates arrive in BM25 order, which also breaks score ties
+            return {"success": True, "ranked": self.ranker.rank(indexed, skills, levels, location, per_site)}
+
+        self.live_scrapes += 1
+        scraped = await self._scrape(skills, location, per_site)
+        if isinstance(scraped, dict):
+            return scraped
+
+        raw_jobs = pd.concat(scraped, ignore_index=True)
+        try:
+            await loop.run_in_executor(None, self._ingest, raw_jobs, skills, location)
+        except Exception:
+            traceback.print_exc()
+        return {"success": True, "ranked": self.ranker.rank(raw_jobs, skills, levels, location, per_site)}
+
+    async def _scrape(self, skills, location, per_site: int) -> list[pd.DataFrame] | dict[str, Any]:
+        """Live LinkedIn + Naukri scrape; an error response if it failed or found nothing."""
+        loop = asyncio.get_event_loop()
 
         try:
             linkedin_jobs, naukri_jobs = await asyncio.gather(
                 loop.run_in_executor(
-                    None, fetch_linkedin_jobs, skills, location or "India", per_site
+                    None, fetch_linkedin_frame, skills, location or "India", per_site
                 ),
                 loop.run_in_executor(
-                    None, fetch_naukri_jobs, skills, location or "India", per_site
+                    None, fetch_naukri_frame, skills, location or "India", per_site
                 ),
             )
         except Exception as exc:
             traceback.print_exc()
             return {"success": False, "error": f"Scraper failed: {exc}"}
 
-        raw_jobs = linkedin_jobs + naukri_jobs
         print(f"[jobs] real: {len(linkedin_jobs)} LinkedIn + {len(naukri_jobs)} Naukri")
 
-        if not raw_jobs:
+        if linkedin_jobs.empty and naukri_jobs.empty:
             return {
                 "success": False,
                 "error": (
@@ -143,21 +321,82 @@ class JobsService:
                     "please try again in a few seconds."
                 ),
             }
+        return [linkedin_jobs, naukri_jobs]
+
+    @staticmethod
+    def _ingest(frame: pd.DataFrame, skills: list[str], location: str | None) -> int:
+        added = job_index.ingest(frame, location)
+        job_index.mark_ingested(skills, location)
+        return added
+
+    # ── background ingestion ─────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        """Start the background job index ingester (JOB_INDEX_REFRESH_MINUTES=0 disables it)."""
+        if self.refresh_seconds > 0 and job_index.enabled and self._ingester is None:
+            self._ingester = asyncio.create_task(self._ingest_loop())
+
+    async def stop(self) -> None:
+        if self._ingester is not None:
+            self._ingester.cancel()
+            await asyncio.gather(self._ingester, return_exceptions=True)
+            self._ingester = None
 
-        # Score + deduplicate by title+company
-        seen: set[str] = set()
-        unique: list[dict] = []
-        for job in raw_jobs:
-            key = (job.get("title", "").lower(), job.get("company", "").lower())
-            if key not in seen:
-                seen.add(key)
-                job["_score"] = _rank(job, skills, levels, location)
-                unique.append(job)
+    def add_index_listener(self, listener: Callable[[], Awaitable[None]]) -> None:
+        """Register a coroutine function to run after each background index refresh."""
+        self._index_listeners.append(listener)
 
-        ranked = sorted(unique, key=lambda j: j["_score"], reverse=True)
-        top = [_clean(j) for j in ranked[:num_jobs]]
+    async def _ingest_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                due = await loop.run_in_executor(
+                    None, job_index.due_queries, self.refresh_seconds, self.queries_per_cycle
+                )
+                added = refreshed = 0
+                for skills, location in due:
+                    # Other app processes see the same due queries; only the claimant scrapes
+                    claimed = await loop.run_in_executor(
+                        None, job_index.claim_query, skills, location, self.refresh_seconds, self.refresh_seconds
+                    )
+                    if not claimed:
+                        continue
+                    scraped = await self._scrape(skills, location, self.ingest_per_site)
+                    if not isinstance(scraped, dict):
+                        added += await loop.run_in_executor(
+                            None, self._ingest, pd.concat(scraped, ignore_index=True), skills, location
+                        )
+                        refreshed += 1
+                    # Space the scrapes out so the boards don't rate-limit us
+                    await asyncio.sleep(self.ingest_delay)
+                if refreshed:
+                    print(f"[jobs] index refresh: {refreshed} quer(ies), {added} new listing(s)")
+                    self.index_refreshes += 1
+                    # Cached rankings were built from older listings; the next request re-reads the index
+                    self.results_cache.clear()
+                    for listener in self._index_listeners:
+                        await listener()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                traceback.print_exc()
+            await asyncio.sleep(self.refresh_seconds)
 
-        return {"success": True, "data": {"jobs": top}}
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.results_cache.stats(),
+            "fresh_seconds": self.fresh_seconds,
+            "weights": self.ranker.stats(),
+            "stale_hits": self.stale_hits,
+            "background_refreshes": self.background_refreshes,
+            "refreshes_running": len(self._refreshes),
+            "scrapes_in_flight": len(self._scrapes),
+            "scrape_failures": self.scrape_failures,
+            "index_served": self.index_served,
+            "live_scrapes": self.live_scrapes,
+            "index_refreshes": self.index_refreshes,
+            "index": job_index.stats(),
+        }
 
 
 # Singleton used by the route layer
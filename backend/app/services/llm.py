@@ -1,21 +1,59 @@
 import os
+import re
 import json
-from groq import Groq
-from typing import Dict, Any, List
+import asyncio
+from groq import AsyncGroq
+from typing import AsyncIterator, Dict, Any, List
 from dotenv import load_dotenv
 
+from app.services.cache import TTLCache
+
 
 class RoadmapLLMService:
     def __init__(self):
-        """Initialize Groq client with API key from environment"""
+        """Initialize async Groq client with API key from environment"""
         load_dotenv()
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY environment variable is required")
-        self.client = Groq(api_key=api_key)
+        # Per-call timeout (seconds) and max number of in-flight completions per worker
+        self.timeout = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self.client = AsyncGroq(api_key=api_key, timeout=self.timeout, max_retries=1)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Generated roadmaps keyed on the normalized prompt inputs
+        self.roadmap_cache = TTLCache(
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256")),
+            ttl=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+        )
+
+    @staticmethod
+    def _roadmap_cache_key(skill: str, timeframe: str, current_knowledge: str, target_level: str) -> tuple:
+        return tuple(re.sub(r"\s+", " ", str(v)).strip().lower() for v in (skill, timeframe, current_knowledge, target_level))
+
+    async def _complete(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float = 0.7) -> str:
+        """Run one chat completion without blocking the event loop.
+
+        Waits for a free slot under the concurrency limit, then enforces the
+        per-call timeout on the completion itself.
+        """
+        async with self._semaphore:
+            try:
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        messages=messages,
+                        model="llama-3.3-70b-versatile",
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    ),
+                    timeout=self.timeout
+                )
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"LLM call timed out after {self.timeout:.0f}s")
+        return response.choices[0].message.content
 
-    async def generate_roadmap_content(self, skill: str, timeframe: str, current_knowledge: str, target_level: str) -> Dict[Any, Any]:
-        """Generate personalized roadmap content using Groq LLM"""
+    @staticmethod
+    def _roadmap_messages(skill: str, timeframe: str, current_knowledge: str, target_level: str) -> List[Dict[str, str]]:
         prompt = f"""
 I need a personalized roadmap for learning {skill} within {timeframe}.
 My current knowledge level is {current_knowledge}, and I'd like to reach a {target_level} level of proficiency.
@@ -44,42 +82,75 @@ NOTE:
 7.Make sure the time nodes are properly divided.
 """
 
-        try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert learning path designer. Generate the output EXACTLY in the specified format, customized for the given skill."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
-                temperature=0.7,
-                max_tokens=2048
-            )
-            content = response.choices[0].message.content
-
-            # Split sections based on '---'
-            sections = content.strip().split('---')
-            mermaid_section = sections[0].strip() if len(sections) > 0 else ''
-
-            return {
-                "success": True,
-                "data": {
-                    "mermaid": mermaid_section.strip(),
-                    "descriptions": ""
-                }
+        return [
+            {
+                "role": "system",
+                "content": "You are an expert learning path designer. Generate the output EXACTLY in the specified format, customized for the given skill."
+            },
+            {
+                "role": "user",
+                "content": prompt
             }
+        ]
 
-        except Exception as e:
-            print(f"Error generating roadmap content: {str(e)}")
-            return {
-                "success": False,
-                "error": f"Failed to generate roadmap content: {str(e)}"
-            }
+    @staticmethod
+    def _roadmap_data(content: str) -> Dict[str, str]:
+        # Split sections based on '---'
+        sections = content.strip().split('---')
+        mermaid_section = sections[0].strip() if len(sections) > 0 else ''
+        return {
+            "mermaid": mermaid_section.strip(),
+            "descriptions": ""
+        }
+
+    async def stream_roadmap_content(self, skill: str, timeframe: str, current_knowledge: str, target_level: str, use_cache: bool = True) -> AsyncIterator[str]:
+        """Yield the roadmap outline as the LLM generates it, chunk by chunk.
+
+        A cache hit yields the whole cached outline at once. The timeout
+        applies to each wait for the next chunk rather than to the whole
+        stream. Failures raise RuntimeError.
+        """
+        cache_key = self._roadmap_cache_key(skill, timeframe, current_knowledge, target_level)
+        if use_cache:
+            cached = self.roadmap_cache.get(cache_key)
+            if cached is not None:
+                yield cached["mermaid"]
+                return
+
+        parts: List[str] = []
+        async with self._semaphore:
+            stream = None
+            try:
+                stream = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        messages=self._roadmap_messages(skill, timeframe, current_knowledge, target_level),
+                        model="llama-3.3-70b-versatile",
+                        temperature=0.7,
+                        max_tokens=2048,
+                        stream=True
+                    ),
+                    timeout=self.timeout
+                )
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"Failed to generate roadmap content: LLM stream stalled for {self.timeout:.0f}s")
+            except Exception as e:
+                print(f"Error streaming roadmap content: {str(e)}")
+                raise RuntimeError(f"Failed to generate roadmap content: {str(e)}")
+            finally:
+                if stream is not None:
+                    await stream.close()
+
+        self.roadmap_cache.set(cache_key, self._roadmap_data("".join(parts)))
 
     async def generate_quiz_for_topic(self, topic: str, skill: str = None, level: str = None, num_questions: int = 5, difficulty: str = "medium") -> Dict[str, Any]:
         """Generate a multiple-choice quiz for a given topic."""
@@ -96,17 +167,13 @@ Difficulty: {difficulty}.
 """
 
         try:
-            response = self.client.chat.completions.create(
+            content = (await self._complete(
                 messages=[
                     {"role": "system", "content": "You are a helpful quiz generator. Output must be valid JSON as specified."},
                     {"role": "user", "content": prompt}
                 ],
-                model="llama-3.3-70b-versatile",
-                temperature=0.7,
                 max_tokens=800
-            )
-
-            content = response.choices[0].message.content.strip()
+            )).strip()
 
             try:
                 parsed = json.loads(content)
@@ -157,17 +224,13 @@ Make the recommendations realistic and achievable with the provided skill set.
 """
 
         try:
-            response = self.client.chat.completions.create(
+            content = (await self._complete(
                 messages=[
                     {"role": "system", "content": "You are a helpful job recommendation engine. Output must be valid JSON as specified."},
                     {"role": "user", "content": prompt}
                 ],
-                model="llama-3.3-70b-versatile",
-                temperature=0.7,
                 max_tokens=2000
-            )
-
-            content = response.choices[0].message.content.strip()
+            )).strip()
 
             try:
                 parsed = json.loads(content)
@@ -0,0 +1,123 @@
+"""
+app/services/mermaid.py
+
+Parsers for the '#'-outline ("mermaid") roadmap text produced by the LLM:
+
+    # [root] js
+    ## [a1] Week 1
+    ### [a11] JavaScript Refresher
+
+`parse_mermaid_to_nodes` / `parse_mermaid_to_edges` work on a finished
+outline; `MermaidStreamParser` produces the same nodes and edges line by
+line while the outline is still streaming in.
+"""
+from __future__ import annotations
+
+import re
+
+NODE_RE = re.compile(r'\[(\w+)\]\s+(.+)$')
+NODE_ID_RE = re.compile(r'\[(\w+)\]')
+
+
+def _node_from_line(line: str) -> dict | None:
+    match = NODE_RE.search(line)
+    if not match:
+        return None
+    return {
+        'id': match.group(1),
+        'text': match.group(2),
+        'completed': False,
+        'varName': match.group(1)
+    }
+
+
+def _edge_from_line(line: str, current_levels: dict[int, str]) -> dict | None:
+    """Track the latest node per '#' depth and link `line` to its parent, if any."""
+    match = NODE_ID_RE.search(line)
+    if not match:
+        return None
+    level = line.count('#')
+    node_id = match.group(1)
+    edge = None
+    if level > 1 and (level - 1) in current_levels:
+        parent = current_levels[level - 1]
+        edge = {
+            'id': f'{parent}-{node_id}',
+            'source': parent,
+            'target': node_id
+        }
+    current_levels[level] = node_id
+    return edge
+
+
+def parse_mermaid_to_nodes(mermaid_code: str) -> list[dict]:
+    nodes = []
+    for line in mermaid_code.split('\n'):
+        if line.strip():
+            node = _node_from_line(line)
+            if node:
+                nodes.append(node)
+    return nodes
+
+
+def parse_mermaid_to_edges(mermaid_code: str) -> list[dict]:
+    """Create parent -> child edges from the '#' depth of each node line."""
+    edges = []
+    current_levels: dict[int, str] = {}
+    for line in mermaid_code.split('\n'):
+        if line.strip():
+            edge = _edge_from_line(line, current_levels)
+            if edge:
+                edges.append(edge)
+    return edges
+
+
+class MermaidStreamParser:
+    """Incrementally parse a streaming outline into nodes and hierarchy edges.
+
+    `feed()` takes raw text chunks and returns `(node, edge)` pairs for every
+    line completed by that chunk (`edge` is None for the root). Parsing stops
+    at a '---' separator line, which the prompt uses to end the outline.
+    """
+
+    def __init__(self):
+        self.nodes: list[dict] = []
+        self.edges: list[dict] = []
+        self.finished = False
+        self._lines: list[str] = []
+        self._buffer = ""
+        self._levels: dict[int, str] = {}
+
+    @property
+    def text(self) -> str:
+        """The outline received so far, as the non-streaming path would store it."""
+        return '\n'.join(self._lines).strip()
+
+    def feed(self, chunk: str) -> list[tuple[dict, dict | None]]:
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split('\n')
+        return [parsed for parsed in map(self._parse_line, lines) if parsed]
+
+    def close(self) -> list[tuple[dict, dict | None]]:
+        """Flush the last, unterminated line."""
+        line, self._buffer = self._buffer, ""
+        parsed = self._parse_line(line)
+        return [parsed] if parsed else []
+
+    def _parse_line(self, line: str) -> tuple[dict, dict | None] | None:
+        if self.finished:
+            return None
+        if '---' in line:
+            line = line.split('---', 1)[0]
+            self.finished = True
+        self._lines.append(line)
+        if not line.strip():
+            return None
+        edge = _edge_from_line(line, self._levels)
+        if edge:
+            self.edges.append(edge)
+        node = _node_from_line(line)
+        if not node:
+            return None
+        self.nodes.append(node)
+        return node, edge
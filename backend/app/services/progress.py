@@ -0,0 +1,82 @@
+"""
+app/services/progress.py
+
+Per-node roadmap progress, stored one row per (roadmap_id, node_id) in
+roadmap_node_progress instead of in the roadmap's nodes / marked_nodes JSON.
+  1. Marking a node is a single-row upsert plus a counter update on the roadmap
+  2. Readers join the completed node ids back onto the stored nodes, so the
+     API keeps returning `nodes[].completed` and `marked_nodes`
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models import ComprehensiveRoadmap, RoadmapNodeProgress
+
+
+def set_node_progress(db: Session, roadmap_id: int, node_id: str, completed: bool) -> None:
+    """Upsert one node's completion state; the first completion time is kept on re-marks."""
+    now = datetime.utcnow()
+    stmt = dialect_insert(db)(RoadmapNodeProgress).values(
+        roadmap_id=roadmap_id,
+        node_id=node_id,
+        completed=completed,
+        completed_at=now if completed else None,
+        updated_at=now
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[RoadmapNodeProgress.roadmap_id, RoadmapNodeProgress.node_id],
+        set_={
+            "completed": completed,
+            "completed_at": func.coalesce(RoadmapNodeProgress.completed_at, now) if completed else None,
+            "updated_at": now,
+        }
+    )
+    db.execute(stmt)
+
+
+def replace_progress(db: Session, roadmap_id: int, marked_nodes: Iterable[str]) -> None:
+    """Make `marked_nodes` the complete set of completed nodes for the roadmap."""
+    marked = list(dict.fromkeys(marked_nodes))
+    for node_id in marked:
+        set_node_progress(db, roadmap_id, node_id, True)
+    db.query(RoadmapNodeProgress).filter(
+        RoadmapNodeProgress.roadmap_id == roadmap_id,
+        RoadmapNodeProgress.completed == True,
+        RoadmapNodeProgress.node_id.notin_(marked)
+    ).update({"completed": False, "completed_at": None, "updated_at": datetime.utcnow()}, synchronize_session=False)
+
+
+def refresh_counters(db: Session, roadmap: ComprehensiveRoadmap) -> None:
+    """Recompute the roadmap's stored total / completed node counters and progress."""
+    roadmap.total_nodes = len(roadmap.nodes or [])
+    roadmap.completed_nodes = db.query(func.count()).select_from(RoadmapNodeProgress).filter(
+        RoadmapNodeProgress.roadmap_id == roadmap.id,
+        RoadmapNodeProgress.completed == True
+    ).scalar()
+    roadmap.progress_permille = roadmap.completed_nodes * 1000 // max(roadmap.total_nodes, 1)
+
+
+def completed_node_ids(db: Session, roadmap_ids: Iterable[int]) -> dict[int, list[str]]:
+    """Completed node ids per roadmap, in the order they were completed."""
+    result: dict[int, list[str]] = {roadmap_id: [] for roadmap_id in roadmap_ids}
+    if not result:
+        return result
+    rows = db.query(RoadmapNodeProgress.roadmap_id, RoadmapNodeProgress.node_id).filter(
+        RoadmapNodeProgress.roadmap_id.in_(list(result)),
+        RoadmapNodeProgress.completed == True
+    ).order_by(RoadmapNodeProgress.completed_at, RoadmapNodeProgress.node_id)
+    for roadmap_id, node_id in rows:
+        result[roadmap_id].append(node_id)
+    return result
+
+
+def with_progress(nodes: list[dict] | None, marked_nodes: list[str]) -> list[dict]:
+    """Copy of `nodes` with each node's `completed` flag taken from `marked_nodes`."""
+    marked = set(marked_nodes)
+    return [{**node, "completed": node.get("id") in marked} for node in nodes or []]
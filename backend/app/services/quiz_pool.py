@@ -0,0 +1,92 @@
+"""
+app/services/quiz_pool.py
+
+Shared, cross-user pool of generated quizzes.
+  1. Quizzes are keyed on the normalized (topic, skill, level, difficulty)
+  2. Each key is filled up to QUIZ_POOL_VARIANTS variants, then served by
+     picking one of them at random so users still get variety
+  3. The LLM is only called while a key has fewer variants than that, and
+     concurrent requests for the same key share one generation
+"""
+from __future__ import annotations
+
+import os
+import random
+import re
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import QuizPoolEntry
+from app.services.cache import SingleFlight
+from app.services.llm import llm_service
+
+QUIZ_POOL_VARIANTS = int(os.getenv("QUIZ_POOL_VARIANTS", "3"))
+
+_inflight = SingleFlight()
+pool_stats = {"hits": 0, "misses": 0}
+
+
+def _normalize(value: str | None) -> str:
+    return re.sub(r"\s+", " ", value or "").strip().lower()
+
+
+def pool_key(topic: str, skill: str | None, level: str | None, difficulty: str) -> str:
+    return "|".join(_normalize(v) for v in (topic, skill, level, difficulty))
+
+
+async def _generate_variant(key: str, topic: str, skill: str | None, level: str | None, difficulty: str) -> dict[str, Any]:
+    """Generate one quiz with the LLM and add it to the pool under `key`."""
+    llm_resp = await llm_service.generate_quiz_for_topic(topic, skill=skill, level=level, difficulty=difficulty)
+    if not llm_resp.get("success"):
+        return llm_resp
+
+    async with AsyncSessionLocal() as db:
+        entry = QuizPoolEntry(
+            pool_key=key,
+            topic=topic,
+            skill=skill,
+            level=level,
+            difficulty=difficulty,
+            quiz_json=llm_resp.get("data"),
+            created_at=datetime.utcnow()
+        )
+        db.add(entry)
+        await db.commit()
+        return {"success": True, "data": entry.id}
+
+
+async def get_pooled_quiz(
+    db: AsyncSession,
+    topic: str,
+    skill: str | None = None,
+    level: str | None = None,
+    difficulty: str = "medium",
+    exclude_entry_id: int | None = None,
+    force_new: bool = False,
+) -> dict[str, Any]:
+    """
+    Pick a pooled quiz variant for the given topic, generating one if needed.
+
+    While the key holds fewer than QUIZ_POOL_VARIANTS variants every request
+    adds one, so the pool fills up before it is served from; after that a
+    variant is picked at random. `exclude_entry_id` is the variant the user
+    already has; with `force_new` a different one is returned whenever the
+    pool has one (a full pool is never grown past the cap).
+    """
+    key = pool_key(topic, skill, level, difficulty)
+    variants = (await db.scalars(select(QuizPoolEntry).where(QuizPoolEntry.pool_key == key))).all()
+
+    if variants and len(variants) >= QUIZ_POOL_VARIANTS:
+        candidates = [v for v in variants if v.id != exclude_entry_id] if force_new else variants
+        pool_stats["hits"] += 1
+        return {"success": True, "data": random.choice(candidates or variants)}
+
+    pool_stats["misses"] += 1
+    result = await _inflight.do(key, lambda: _generate_variant(key, topic, skill, level, difficulty))
+    if not result.get("success"):
+        return result
+    return {"success": True, "data": await db.get(QuizPoolEntry, result["data"])}
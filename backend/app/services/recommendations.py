@@ -0,0 +1,180 @@
+"""
+app/services/recommendations.py
+
+Per-user job recommendations, precomputed instead of scraped per page view.
+  1. A user's row in job_recommendations holds the skills derived from their
+     roadmaps, the top jobs for them and when that was computed
+  2. Recomputation runs in the background when a roadmap is created,
+     completed or deleted, and after every job index refresh; requests for
+     the same user are coalesced
+  3. GET /jobs/recommendations is a keyed read of that row; only a user's
+     first visit (no row yet) computes inline, and rows older than
+     RECOMMENDATIONS_MAX_AGE_HOURS are served while a refresh is queued
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Iterable
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, dialect_insert
+from app.models import ComprehensiveRoadmap, JobRecommendation
+from app.services.cache import SingleFlight
+from app.services.jobs import jobs_service
+
+RECOMMENDATIONS_NUM_JOBS = int(os.getenv("RECOMMENDATIONS_NUM_JOBS", "9"))
+RECOMMENDATIONS_MAX_AGE_HOURS = float(os.getenv("RECOMMENDATIONS_MAX_AGE_HOURS", "24"))
+RECOMMENDATIONS_MAX_CONCURRENCY = int(os.getenv("RECOMMENDATIONS_MAX_CONCURRENCY", "2"))
+
+
+def user_skills(roadmaps: Iterable[tuple[str, bool]]) -> tuple[list[str], list[str]]:
+    """
+    (skills, completed_skills) from a user's (skill, is_completed) roadmap pairs:
+    completed skills first, then ongoing ones, deduplicated case-insensitively.
+    """
+    roadmaps = list(roadmaps)
+    completed_skills = [skill for skill, done in roadmaps if done]
+    ongoing_skills = [skill for skill, done in roadmaps if not done]
+    seen = set()
+    skills = []
+    for s in (completed_skills + ongoing_skills):
+        if s.lower() not in seen:
+            seen.add(s.lower())
+            skills.append(s)
+    return skills, completed_skills
+
+
+def recommendation_payload(row: JobRecommendation) -> dict[str, Any]:
+    return {
+        "success": True,
+        "jobs": row.jobs or [],
+        "skills": row.skills or [],
+        # Keep backwards-compat key
+        "completed_skills": row.completed_skills or [],
+        "computed_at": row.computed_at.isoformat() if row.computed_at else None,
+    }
+
+
+class RecommendationService:
+
+    def __init__(self, num_jobs: int = RECOMMENDATIONS_NUM_JOBS,
+                 max_age_hours: float = RECOMMENDATIONS_MAX_AGE_HOURS,
+                 max_concurrency: int = RECOMMENDATIONS_MAX_CONCURRENCY):
+        self.num_jobs = num_jobs
+        self.max_age = timedelta(hours=max_age_hours)
+        self.max_concurrency = max_concurrency
+        self._semaphore: asyncio.Semaphore | None = None
+        self._flight = SingleFlight()
+        self._dirty: set[int] = set()
+        self._tasks: dict[int, asyncio.Task] = {}
+        self.computed = 0
+        self.failures = 0
+        self.inline = 0
+
+    # ── background refresh ───────────────────────────────────────────────────
+
+    def schedule(self, user_id: int) -> None:
+        """Queue a recompute for the user; a refresh already running re-runs once it finishes."""
+        self._dirty.add(user_id)
+        if user_id not in self._tasks:
+            self._tasks[user_id] = asyncio.ensure_future(self._drain(user_id))
+
+    async def _drain(self, user_id: int) -> None:
+        try:
+            while user_id in self._dirty:
+                self._dirty.discard(user_id)
+                try:
+                    await self.refresh(user_id)
+                except Exception:
+                    traceback.print_exc()
+        finally:
+            self._tasks.pop(user_id, None)
+
+    async def refresh_all(self) -> None:
+        """Queue a recompute for every user that has stored recommendations."""
+        async with AsyncSessionLocal() as db:
+            user_ids = (await db.scalars(select(JobRecommendation.user_id))).all()
+        for user_id in user_ids:
+            self.schedule(user_id)
+        if user_ids:
+            print(f"[recommendations] refreshing {len(user_ids)} user(s) after job index refresh")
+
+    # ── compute ──────────────────────────────────────────────────────────────
+
+    async def refresh(self, user_id: int) -> JobRecommendation | None:
+        """Recompute and store the user's recommendations (coalesced per user)."""
+        return await self._flight.do(user_id, lambda: self._compute(user_id))
+
+    async def _compute(self, user_id: int) -> JobRecommendation | None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            async with AsyncSessionLocal() as db:
+                roadmaps = (await db.execute(
+                    select(ComprehensiveRoadmap.skill, ComprehensiveRoadmap.is_completed)
+                    .where(ComprehensiveRoadmap.user_id == user_id)
+                    .order_by(ComprehensiveRoadmap.id)
+                )).all()
+            skills, completed_skills = user_skills((skill, bool(done)) for skill, done in roadmaps)
+
+            # No session is held while jobs are fetched (possibly a live scrape)
+            job_response = await jobs_service.fetch_jobs_from_naukri(skills=skills, num_jobs=self.num_jobs) if skills else None
+
+            async with AsyncSessionLocal() as db:
+                if not skills:
+                    await db.execute(delete(JobRecommendation).where(JobRecommendation.user_id == user_id))
+                    await db.commit()
+                    return None
+
+                values: dict[str, Any] = {
+                    "skills": skills,
+                    "completed_skills": completed_skills,
+                    "computed_at": datetime.utcnow(),
+                }
+                if job_response["success"]:
+                    values.update(jobs=job_response["data"].get("jobs", []), error=None)
+                else:
+                    # Keep the previous jobs (if any) and record why the refresh failed
+                    self.failures += 1
+                    values["error"] = job_response.get("error", "Failed to fetch jobs")
+
+                stmt = dialect_insert(db)(JobRecommendation).values(user_id=user_id, **{"jobs": [], **values})
+                stmt = stmt.on_conflict_do_update(index_elements=[JobRecommendation.user_id], set_=values)
+                await db.execute(stmt)
+                await db.commit()
+                self.computed += 1
+                return await db.get(JobRecommendation, user_id)
+
+    # ── read ─────────────────────────────────────────────────────────────────
+
+    async def get(self, db: AsyncSession, user_id: int) -> JobRecommendation | None:
+        """
+        The user's stored recommendations; computed inline on first use and
+        refreshed in the background once older than the max age.
+        """
+        row = await db.get(JobRecommendation, user_id)
+        if row is None:
+            self.inline += 1
+            return await self.refresh(user_id)
+        if row.computed_at is None or datetime.utcnow() - row.computed_at > self.max_age or (row.error and not row.jobs):
+            self.schedule(user_id)
+        return row
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "computed": self.computed,
+            "computed_inline": self.inline,
+            "failures": self.failures,
+            "refreshing": len(self._tasks),
+            "max_age_hours": self.max_age.total_seconds() / 3600,
+        }
+
+
+# Singleton used by the roadmap routes and the job index refresh hook
+job_recommendations = RecommendationService()
+jobs_service.add_index_listener(job_recommendations.refresh_all)
@@ -1,7 +1,17 @@
-import requests
+import asyncio
+import re
+import httpx
+from typing import AsyncIterable, AsyncIterator, Iterable
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import os
 
+from sqlalchemy import delete, func, select
+
+from app.database import AsyncSessionLocal, dialect_insert
+from app.models import ResourceCacheEntry
+from app.services.cache import SingleFlight
+
 load_dotenv()
 
 # Store API keys securely
@@ -9,41 +19,272 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 CX_ID = os.getenv("CX_ID")
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
+# Enrichment tuning: max concurrent lookups, per-lookup timeout, whole-roadmap deadline
+RESOURCE_MAX_CONCURRENCY = int(os.getenv("RESOURCE_MAX_CONCURRENCY", "8"))
+RESOURCE_LOOKUP_TIMEOUT = float(os.getenv("RESOURCE_LOOKUP_TIMEOUT", "5"))
+RESOURCE_DEADLINE_SECONDS = float(os.getenv("RESOURCE_DEADLINE_SECONDS", "15"))
+
+# Lookup cache (resource_cache table): entry lifetime and max number of rows
+RESOURCE_CACHE_TTL_SECONDS = int(os.getenv("RESOURCE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESOURCE_CACHE_MAX_ENTRIES = int(os.getenv("RESOURCE_CACHE_MAX_ENTRIES", "5000"))
+# Expired / overflow rows are pruned once every this many cache writes
+RESOURCE_CACHE_PRUNE_EVERY = int(os.getenv("RESOURCE_CACHE_PRUNE_EVERY", "200"))
+
+# Nodes whose text matches one of these are time periods and get no resources
+TIME_WORDS = ('day', 'am', 'pm', 'morning', 'afternoon', 'night', 'week', 'hour', 'month', 'year')
+
+_client: httpx.AsyncClient | None = None
+_inflight = SingleFlight()
+_prune_lock = asyncio.Lock()
+_writes_since_prune = 0
+
+
+def _http_client() -> httpx.AsyncClient:
+    """Shared client so lookups reuse connections across roadmaps."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=RESOURCE_LOOKUP_TIMEOUT)
+    return _client
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+# ── persistent lookup cache ──────────────────────────────────────────────────
+
+async def _cache_get(key: str) -> list[str] | None:
+    async with AsyncSessionLocal() as db:
+        entry = await db.get(ResourceCacheEntry, key)
+    # Expired rows are treated as misses; _prune_cache removes them
+    if entry is None or (entry.expires_at and entry.expires_at <= datetime.utcnow()):
+        return None
+    return list(entry.links or [])
+
+
+async def _cache_put(key: str, links: list[str]) -> None:
+    global _writes_since_prune
+    async with AsyncSessionLocal() as db:
+        try:
+            now = datetime.utcnow()
+            values = {"links": links, "created_at": now,
+                      "expires_at": now + timedelta(seconds=RESOURCE_CACHE_TTL_SECONDS)}
+            stmt = dialect_insert(db)(ResourceCacheEntry).values(cache_key=key, **values)
+            await db.execute(stmt.on_conflict_do_update(index_elements=[ResourceCacheEntry.cache_key], set_=values))
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(f"[resources] cache write failed for '{key}': {e}")
+            return
+
+    _writes_since_prune += 1
+    if _writes_since_prune >= RESOURCE_CACHE_PRUNE_EVERY and not _prune_lock.locked():
+        async with _prune_lock:
+            _writes_since_prune = 0
+            await _prune_cache()
+
+
+async def _prune_cache() -> None:
+    """Keep the table bounded: expired rows go first, then the oldest ones."""
+    async with AsyncSessionLocal() as db:
+        try:
+            now = datetime.utcnow()
+            await db.execute(delete(ResourceCacheEntry).where(ResourceCacheEntry.expires_at <= now))
+            overflow = await db.scalar(select(func.count()).select_from(ResourceCacheEntry)) - RESOURCE_CACHE_MAX_ENTRIES
+            if overflow > 0:
+                oldest = select(ResourceCacheEntry.cache_key).order_by(
+                    ResourceCacheEntry.expires_at
+                ).limit(overflow)
+                await db.execute(delete(ResourceCacheEntry).where(
+                    ResourceCacheEntry.cache_key.in_(oldest.scalar_subquery())
+                ))
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(f"[resources] cache prune failed: {e}")
+
+
+async def _cached_lookup(kind: str, query: str, fetch) -> list[str]:
+    """Serve `fetch(query)` from the resource cache, collapsing identical in-flight lookups."""
+    key = f"{kind}:{normalize_query(query)}"
+    cached = await _cache_get(key)
+    if cached is not None:
+        return cached
+
+    async def fetch_and_store() -> list[str]:
+        links = await fetch(query)
+        await _cache_put(key, links)
+        return links
+
+    return await _inflight.do(key, fetch_and_store)
+
+
+# ── external lookups ─────────────────────────────────────────────────────────
 
-def get_website_links(query: str) -> list[str]:
-    """Fetches up to 2 website links from Google Custom Search API."""
+async def _fetch_website_links(query: str) -> list[str]:
+    response = await _http_client().get(
+        "https://www.googleapis.com/customsearch/v1",
+        params={"q": query, "key": GOOGLE_API_KEY, "cx": CX_ID, "num": 2},
+    )
+    response.raise_for_status()
+    return [item["link"] for item in response.json().get("items", [])]
+
+
+async def _fetch_video_links(query: str) -> list[str]:
+    response = await _http_client().get(
+        "https://www.googleapis.com/youtube/v3/search",
+        params={"part": "snippet", "q": query, "type": "video", "maxResults": 2, "key": YOUTUBE_API_KEY},
+    )
+    response.raise_for_status()
+    videos = []
+    for item in response.json().get("items", []):
+        video_id = item.get("id", {}).get("videoId")
+        if video_id:
+            videos.append(f"https://www.youtube.com/watch?v={video_id}")
+    return videos
+
+
+async def get_website_links(query: str) -> list[str]:
+    """Fetches up to 2 website links from Google Custom Search API (cached)."""
     if not GOOGLE_API_KEY or not CX_ID:
         return []
     try:
-        url = (
-            f"https://www.googleapis.com/customsearch/v1"
-            f"?q={query}&key={GOOGLE_API_KEY}&cx={CX_ID}&num=2"
-        )
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        return [item["link"] for item in response.json().get("items", [])]
+        return await _cached_lookup("web", query, _fetch_website_links)
     except Exception as e:
         print(f"[resources] get_website_links failed for '{query}': {e}")
         return []
 
 
-def get_video_links(query: str) -> list[str]:
-    """Fetches up to 2 YouTube video links using YouTube Data API."""
+async def get_video_links(query: str) -> list[str]:
+    """Fetches up to 2 YouTube video links using YouTube Data API (cached)."""
     if not YOUTUBE_API_KEY:
         return []
     try:
-        url = (
-            f"https://www.googleapis.com/youtube/v3/search"
-            f"?part=snippet&q={query}&type=video&maxResults=2&key={YOUTUBE_API_KEY}"
-        )
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        videos = []
-        for item in response.json().get("items", []):
-            video_id = item.get("id", {}).get("videoId")
-            if video_id:
-                videos.append(f"https://www.youtube.com/watch?v={video_id}")
-        return videos
+        return await _cached_lookup("video", query, _fetch_video_links)
     except Exception as e:
         print(f"[resources] get_video_links failed for '{query}': {e}")
         return []
+
+
+def is_time_node(node_text: str) -> bool:
+    return any(time_word in node_text.lower() for time_word in TIME_WORDS)
+
+
+def format_description(node_text: str, websites: list[str], videos: list[str]) -> str:
+    """Format a node description the way NodeInfo.jsx expects it."""
+    description = f"Learn {node_text}"
+    if videos:
+        description += f"\nyoutube links: {', '.join(videos)}"
+    if websites:
+        description += f"\nwebsite links: {', '.join(websites)}"
+    return description
+
+
+async def _iter_nodes(nodes: Iterable[dict] | AsyncIterable[dict]) -> AsyncIterator[dict]:
+    if hasattr(nodes, "__aiter__"):
+        async for node in nodes:
+            yield node
+    else:
+        for node in nodes:
+            yield node
+
+
+_FED = object()
+
+
+async def iter_node_descriptions(
+    nodes: Iterable[dict] | AsyncIterable[dict],
+    max_concurrency: int = RESOURCE_MAX_CONCURRENCY,
+    deadline: float = RESOURCE_DEADLINE_SECONDS,
+) -> AsyncIterator[tuple[str, str]]:
+    """
+    Yield `(node_id, description)` for every roadmap node as soon as its
+    resource lookups finish.
+
+    `nodes` may be a list or an async stream of nodes; lookups for a node
+    start as soon as it arrives, at most `max_concurrency` in flight.
+    `deadline` counts from the moment the last node has arrived: lookups
+    still running then are cancelled and their nodes are yielded last,
+    with whatever links did arrive. Every node id is yielded exactly once.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    ready: asyncio.Queue = asyncio.Queue()
+    texts: dict[str, str] = {}
+    links: dict[str, dict[str, list[str]]] = {}
+    outstanding: dict[str, int] = {}
+    lookups: set[asyncio.Task] = set()
+    seen: dict[str, None] = {}   # node ids in arrival order
+    emitted: set[str] = set()
+
+    def describe(node_id: str) -> str:
+        found = links[node_id]
+        return format_description(texts[node_id], found.get("websites", []), found.get("videos", []))
+
+    async def run_lookup(node_id: str, kind: str, lookup, query: str):
+        async with semaphore:
+            links[node_id][kind] = await lookup(query)
+        outstanding[node_id] -= 1
+        if outstanding[node_id] == 0:
+            ready.put_nowait((node_id, describe(node_id)))
+
+    async def feed():
+        try:
+            async for node in _iter_nodes(nodes):
+                node_id, node_text = node["id"], node["text"]
+                if node_id in emitted:
+                    continue
+                seen[node_id] = None
+                if is_time_node(node_text):
+                    ready.put_nowait((node_id, f"Time period: {node_text}"))
+                    continue
+                # A repeated id joins the lookups already in flight for it
+                if node_id not in links:
+                    links[node_id] = {}
+                texts[node_id] = node_text
+                outstanding[node_id] = outstanding.get(node_id, 0) + 2
+                for kind, lookup in (("websites", get_website_links), ("videos", get_video_links)):
+                    lookups.add(asyncio.create_task(run_lookup(node_id, kind, lookup, node_text)))
+        finally:
+            ready.put_nowait(_FED)
+
+    feeder = asyncio.create_task(feed())
+    end = None
+    try:
+        while end is None or len(emitted) < len(seen):
+            timeout = None if end is None else end - loop.time()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(ready.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _FED:
+                await feeder  # re-raises if the node stream failed
+                end = loop.time() + deadline
+                continue
+            if item[0] not in emitted:
+                emitted.add(item[0])
+                yield item
+
+        # Deadline hit: nodes that finished but were still queued go first,
+        # then the late ones with whatever links did arrive
+        while not ready.empty():
+            item = ready.get_nowait()
+            if item is not _FED and item[0] not in emitted:
+                emitted.add(item[0])
+                yield item
+        late = [node_id for node_id in seen if node_id not in emitted]
+        if late:
+            dropped = sum(1 for task in lookups if not task.done())
+            print(f"[resources] deadline hit: {dropped} of {len(lookups)} lookups dropped")
+            for node_id in late:
+                emitted.add(node_id)
+                yield node_id, describe(node_id)
+    finally:
+        pending = [task for task in (feeder, *lookups) if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
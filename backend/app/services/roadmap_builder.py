@@ -0,0 +1,136 @@
+"""
+app/services/roadmap_builder.py
+
+Roadmap generation pipeline shared by the create routes:
+  1. Streams the outline from the LLM into MermaidStreamParser
+  2. Starts resource lookups for each node as soon as its line is parsed,
+     while later nodes are still being generated
+  3. Reports progress as (event, payload) pairs, ending with "generated"
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator
+
+from sqlalchemy.orm import Session
+
+from app.models import ComprehensiveRoadmap
+from app.services.llm import llm_service
+from app.services.mermaid import MermaidStreamParser
+from app.services.resources import iter_node_descriptions
+
+_DONE = object()
+
+
+def save_roadmap(db: Session, user_id: int, data: dict, mermaid_content: str, nodes: list, edges: list, descriptions: dict,
+                 commit: bool = True):
+    """
+    Persist a generated roadmap for `user_id`; `data` holds the creation form fields.
+    With commit=False the row is only flushed, so the caller can commit it together
+    with its own changes.
+    """
+    new_roadmap = ComprehensiveRoadmap(
+        user_id=user_id,
+        skill=data["skill"],
+        timeframe=data["timeframe"],
+        current_knowledge=data["current_knowledge"],
+        target_level=data["target_level"],
+        content={
+            'mermaid': mermaid_content,
+            'descriptions': descriptions
+        },
+        nodes=nodes,
+        edges=edges,
+        node_desc=descriptions,
+        marked_nodes=[],
+        total_nodes=len(nodes),
+        completed_nodes=0,
+        progress_permille=0,
+        is_completed=False
+    )
+    db.add(new_roadmap)
+    if not commit:
+        db.flush()
+        return new_roadmap
+    db.commit()
+    db.refresh(new_roadmap)
+    return new_roadmap
+
+
+async def _drain(queue: asyncio.Queue) -> AsyncIterator[dict]:
+    while (node := await queue.get()) is not None:
+        yield node
+
+
+async def build_roadmap(
+    skill: str,
+    timeframe: str,
+    current_knowledge: str,
+    target_level: str,
+    use_cache: bool = True,
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """
+    Generate and enrich a roadmap, yielding events as they happen:
+      node      -> {"node", "edge"} for each outline line as it streams in
+      nodes     -> {"nodes", "edges", "markmap"} once the outline is complete
+      resource  -> {"node_id", "description"} as each node's lookups finish
+      generated -> {"mermaid", "nodes", "edges", "descriptions"}, last
+    Generation failures are raised to the caller.
+    """
+    parser = MermaidStreamParser()
+    events: asyncio.Queue = asyncio.Queue()
+    to_enrich: asyncio.Queue = asyncio.Queue()
+
+    async def generate():
+        try:
+            async for chunk in llm_service.stream_roadmap_content(
+                skill, timeframe, current_knowledge, target_level, use_cache=use_cache
+            ):
+                for node, edge in parser.feed(chunk):
+                    to_enrich.put_nowait(node)
+                    events.put_nowait(("node", {"node": node, "edge": edge}))
+            for node, edge in parser.close():
+                to_enrich.put_nowait(node)
+                events.put_nowait(("node", {"node": node, "edge": edge}))
+            events.put_nowait(("nodes", {"nodes": parser.nodes, "edges": parser.edges, "markmap": parser.text}))
+        finally:
+            to_enrich.put_nowait(None)
+
+    async def enrich():
+        async for node_id, description in iter_node_descriptions(_drain(to_enrich)):
+            events.put_nowait(("resource", {"node_id": node_id, "description": description}))
+
+    async def run(stage):
+        try:
+            await stage()
+        except Exception as e:
+            events.put_nowait(("error", e))
+        finally:
+            events.put_nowait(_DONE)
+
+    tasks = [asyncio.create_task(run(generate)), asyncio.create_task(run(enrich))]
+    found: dict[str, str] = {}
+    try:
+        running = len(tasks)
+        while running:
+            item = await events.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            event, payload = item
+            if event == "error":
+                raise payload
+            if event == "resource":
+                found[payload["node_id"]] = payload["description"]
+            yield event, payload
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    yield "generated", {
+        "mermaid": parser.text,
+        "nodes": parser.nodes,
+        "edges": parser.edges,
+        "descriptions": {node["id"]: found[node["id"]] for node in parser.nodes},
+    }
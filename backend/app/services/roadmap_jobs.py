@@ -0,0 +1,305 @@
+"""
+app/services/roadmap_jobs.py
+
+Background roadmap generation.
+  1. /api/roadmap/create with "background": true stores a RoadmapJob row
+     and returns its id straight away
+  2. An in-process pool of ROADMAP_WORKERS asyncio workers runs queued jobs
+  3. Progress (outline, nodes, finished node descriptions) is saved on the
+     job row, so jobs left unfinished by a crash or restart are re-queued on
+     startup and only enrich the nodes that were not done yet
+  4. A worker claims a job with a conditional UPDATE before running it and
+     keeps the claim alive with a heartbeat on updated_at, so with several
+     app processes each job runs once; a claim whose heartbeat is older than
+     ROADMAP_JOB_LEASE_SECONDS is treated as abandoned and can be taken over
+  5. Every ROADMAP_JOB_SWEEP_SECONDS each process queues the jobs that are
+     free to claim (queued, or running with an expired lease), so jobs
+     abandoned by a crashed process are picked up without a restart
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import RoadmapJob
+from app.services.recommendations import job_recommendations
+from app.services.resources import iter_node_descriptions
+from app.services.roadmap_builder import build_roadmap, save_roadmap
+
+ROADMAP_WORKERS = int(os.getenv("ROADMAP_WORKERS", "2"))
+ROADMAP_JOB_MAX_ATTEMPTS = int(os.getenv("ROADMAP_JOB_MAX_ATTEMPTS", "3"))
+ROADMAP_JOB_LEASE_SECONDS = float(os.getenv("ROADMAP_JOB_LEASE_SECONDS", "120"))
+ROADMAP_JOB_SWEEP_SECONDS = float(os.getenv("ROADMAP_JOB_SWEEP_SECONDS", "30"))
+
+# Finished node descriptions are written to the job row in batches of this size
+_SAVE_EVERY = 5
+
+RUNNING = ("generating", "enriching")
+FORM_FIELDS = ("skill", "timeframe", "current_knowledge", "target_level")
+
+
+def job_status(job: RoadmapJob) -> dict[str, Any]:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "roadmap_id": job.roadmap_id,
+        "error": job.error,
+        "nodes_total": len(job.nodes) if job.nodes is not None else None,
+        "nodes_enriched": len(job.descriptions or {}),
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+class RoadmapJobQueue:
+
+    def __init__(self, workers: int = ROADMAP_WORKERS):
+        self.workers = workers
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._sweeper: asyncio.Task | None = None
+        # Ids waiting in this process's queue, so a sweep doesn't add them twice
+        self._queued: set[str] = set()
+
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._queue, self._tasks, self._queued = loop, asyncio.Queue(), [], set()
+            self._sweeper = None
+        self._tasks = [t for t in self._tasks if not t.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    def _put(self, job_id: str) -> None:
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def start(self) -> None:
+        """Start the workers and queue the jobs a previous process left unfinished."""
+        self._ensure_workers()
+        found = await self._sweep()
+        if found:
+            print(f"[roadmap_jobs] resuming {found} unfinished job(s)")
+
+    async def stop(self) -> None:
+        tasks = self._tasks + ([self._sweeper] if self._sweeper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks, self._sweeper = [], None
+
+    async def enqueue(self, db: AsyncSession, user_id: int, params: dict) -> RoadmapJob:
+        job = RoadmapJob(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            status="queued",
+            params=params,
+            descriptions={},
+            attempts=0
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        self._ensure_workers()
+        self._put(job.id)
+        return job
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "workers": len([t for t in self._tasks if not t.done()]),
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+    # ── worker side ──────────────────────────────────────────────────────────
+
+    async def _sweep(self) -> int:
+        """Queue every job that is free to claim: queued, or running with an expired lease."""
+        expired = datetime.utcnow() - timedelta(seconds=ROADMAP_JOB_LEASE_SECONDS)
+        async with AsyncSessionLocal() as db:
+            job_ids = (await db.scalars(
+                select(RoadmapJob.id)
+                .where(or_(
+                    RoadmapJob.status == "queued",
+                    and_(RoadmapJob.status.in_(RUNNING), RoadmapJob.updated_at < expired),
+                ))
+                .order_by(RoadmapJob.created_at)
+            )).all()
+        found = [job_id for job_id in job_ids if job_id not in self._queued]
+        for job_id in found:
+            self._put(job_id)
+        return len(found)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(ROADMAP_JOB_SWEEP_SECONDS)
+            try:
+                await self._sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                traceback.print_exc()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                traceback.print_exc()
+                await self._record_failure(job_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _record_failure(self, job_id: str, error: Exception) -> None:
+        """Retry the job until it has used up its attempts, then mark it failed."""
+        async with AsyncSessionLocal() as db:
+            job = await db.get(RoadmapJob, job_id)
+            if job is None:
+                return
+            job.error = str(error)
+            job.status = "failed" if (job.attempts or 0) >= ROADMAP_JOB_MAX_ATTEMPTS else "queued"
+            await db.commit()
+        if job.status != "failed":
+            self._put(job_id)
+
+    async def _claim(self, db: AsyncSession, job_id: str) -> bool:
+        """
+        Take the job for this worker: a single conditional UPDATE, so only one
+        process wins. Queued jobs are free; running ones only once their
+        heartbeat is older than the lease.
+        """
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(RoadmapJob)
+            .where(
+                RoadmapJob.id == job_id,
+                or_(
+                    RoadmapJob.status == "queued",
+                    and_(RoadmapJob.status.in_(RUNNING),
+                         RoadmapJob.updated_at < now - timedelta(seconds=ROADMAP_JOB_LEASE_SECONDS)),
+                ),
+            )
+            .values(
+                status=case((RoadmapJob.status == "queued", "generating"), else_=RoadmapJob.status),
+                attempts=func.coalesce(RoadmapJob.attempts, 0) + 1,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Keep this worker's claim on the job fresh while it runs."""
+        while True:
+            await asyncio.sleep(ROADMAP_JOB_LEASE_SECONDS / 3)
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(RoadmapJob)
+                    .where(RoadmapJob.id == job_id, RoadmapJob.status.in_(RUNNING))
+                    .values(updated_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+
+    async def _run(self, job_id: str) -> None:
+        async with AsyncSessionLocal() as db:
+            if not await self._claim(db, job_id):
+                # Finished, or held by another live process; the sweep queues
+                # it again if that process's lease runs out
+                return
+            job = await db.get(RoadmapJob, job_id)
+
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                if job.nodes is None:
+                    await self._generate(db, job)
+                else:
+                    await self._enrich_remaining(db, job)
+            finally:
+                heartbeat.cancel()
+
+            # The roadmap row and the job's completion commit together; if the
+            # job was finished elsewhere meanwhile, the roadmap is rolled back
+            descriptions = {node["id"]: job.descriptions[node["id"]] for node in job.nodes}
+            roadmap = await db.run_sync(
+                save_roadmap, job.user_id, job.params, job.mermaid, job.nodes, job.edges, descriptions, commit=False
+            )
+            completed = await db.execute(
+                update(RoadmapJob)
+                .where(RoadmapJob.id == job_id, RoadmapJob.status.in_(RUNNING))
+                .values(status="completed", roadmap_id=roadmap.id, error=None, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            if completed.rowcount != 1:
+                await db.rollback()
+                print(f"[roadmap_jobs] job {job_id} was completed by another worker")
+                return
+            await db.commit()
+            print(f"[roadmap_jobs] job {job_id} completed as roadmap {roadmap.id}")
+            job_recommendations.schedule(job.user_id)
+
+    async def _generate(self, db: AsyncSession, job: RoadmapJob) -> None:
+        """Run the full pipeline, saving the outline and descriptions as they arrive."""
+        job.status = "generating"
+        await db.commit()
+        found = dict(job.descriptions or {})
+        unsaved = 0
+        async for event, payload in build_roadmap(
+            *(job.params[k] for k in FORM_FIELDS),
+            use_cache=not job.params.get("force_new", False)
+        ):
+            if event == "nodes":
+                job.mermaid = payload["markmap"]
+                job.nodes = payload["nodes"]
+                job.edges = payload["edges"]
+                job.status = "enriching"
+                job.descriptions = dict(found)
+                await db.commit()
+                unsaved = 0
+            elif event == "resource":
+                found[payload["node_id"]] = payload["description"]
+                unsaved += 1
+                if job.nodes is not None and unsaved >= _SAVE_EVERY:
+                    job.descriptions = dict(found)
+                    await db.commit()
+                    unsaved = 0
+            elif event == "generated":
+                job.descriptions = payload["descriptions"]
+                await db.commit()
+
+    async def _enrich_remaining(self, db: AsyncSession, job: RoadmapJob) -> None:
+        """Resume a job whose outline is saved: only enrich nodes without a description."""
+        job.status = "enriching"
+        await db.commit()
+        found = dict(job.descriptions or {})
+        remaining = [node for node in job.nodes if node["id"] not in found]
+        unsaved = 0
+        async for node_id, description in iter_node_descriptions(remaining):
+            found[node_id] = description
+            unsaved += 1
+            if unsaved >= _SAVE_EVERY:
+                job.descriptions = dict(found)
+                await db.commit()
+                unsaved = 0
+        job.descriptions = found
+        await db.commit()
+
+
+# Singleton used by the route layer and app startup
+roadmap_job_queue = RoadmapJobQueue()
@@ -0,0 +1,145 @@
+"""
+scripts/bench_auth.py
+
+Latency of GET /api/roadmap/{id} while other clients hammer
+POST /api/auth/login, with bcrypt run inline on the event loop
+(PASSWORD_HASH_WORKERS=0, the old behaviour) and on the hashing pool.
+
+Each mode runs in a fresh process against a throwaway SQLite database:
+
+    cd backend
+    python scripts/bench_auth.py --logins 16 --readers 8 --seconds 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "bench-password"
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run_one(logins: int, readers: int, seconds: float) -> dict:
+    """Runs inside the child process, after DATABASE_URL / PASSWORD_HASH_WORKERS are set."""
+    sys.path.insert(0, BACKEND_DIR)
+    import httpx
+    from app.auth.security import create_access_token, get_password_hash
+    from app.database import SessionLocal
+    from app.main import app
+    from app.models import ComprehensiveRoadmap, User
+
+    db = SessionLocal()
+    try:
+        password_hash = get_password_hash(PASSWORD)
+        users = [User(email=f"bench{i}@example.com", password_hash=password_hash) for i in range(logins + 1)]
+        db.add_all(users)
+        db.flush()
+        nodes = [{"id": f"n{i}", "text": f"Topic {i}", "completed": False, "varName": f"n{i}"} for i in range(30)]
+        roadmap = ComprehensiveRoadmap(
+            user_id=users[0].id, skill="bench", timeframe="4 weeks", current_knowledge="none",
+            target_level="intermediate", content={"mermaid": "", "descriptions": {}}, nodes=nodes,
+            edges=[], node_desc={n["id"]: "x" * 200 for n in nodes}, marked_nodes=[],
+            total_nodes=len(nodes), completed_nodes=0, is_completed=False
+        )
+        db.add(roadmap)
+        db.commit()
+        reader_token = create_access_token({"sub": users[0].email, "uid": users[0].id})
+        roadmap_id = roadmap.id
+        login_emails = [u.email for u in users[1:]]
+    finally:
+        db.close()
+
+    read_latencies: list[float] = []
+    login_latencies: list[float] = []
+    rejected = 0
+    deadline = time.perf_counter() + seconds
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def reader():
+            headers = {"Authorization": f"Bearer {reader_token}"}
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(f"/api/roadmap/{roadmap_id}", headers=headers)
+                response.raise_for_status()
+                read_latencies.append(time.perf_counter() - started)
+
+        async def login(email: str):
+            nonlocal rejected
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.post("/api/auth/login", data={"username": email, "password": PASSWORD})
+                if response.status_code == 503:
+                    rejected += 1
+                    await asyncio.sleep(0.05)
+                    continue
+                response.raise_for_status()
+                login_latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(reader() for _ in range(readers)), *(login(e) for e in login_emails))
+
+    return {
+        "reads_per_s": round(len(read_latencies) / seconds, 1),
+        "read_p50_ms": round(_percentile(read_latencies, 0.50) * 1000, 1),
+        "read_p99_ms": round(_percentile(read_latencies, 0.99) * 1000, 1),
+        "logins_per_s": round(len(login_latencies) / seconds, 1),
+        "login_mean_ms": round(statistics.fmean(login_latencies) * 1000, 1) if login_latencies else 0.0,
+        "logins_rejected": rejected,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login clients")
+    parser.add_argument("--readers", type=int, default=8, help="concurrent roadmap readers")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=4, help="hashing pool size for the pooled run")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_one(args.logins, args.readers, args.seconds))))
+        return
+
+    print(f"{args.logins} login clients, {args.readers} roadmap readers, {args.seconds}s per mode")
+    for label, workers in (("inline", 0), (f"pool({args.workers})", args.workers)):
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{path}",
+            "PASSWORD_HASH_WORKERS": str(workers),
+            "SECRET_KEY": os.getenv("SECRET_KEY", "bench-secret"),
+            "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "bench"),
+        }
+        try:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child",
+                 "--logins", str(args.logins), "--readers", str(args.readers), "--seconds", str(args.seconds)],
+                env=env, cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+            ).stdout
+        finally:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"  {label:<8}  reads/s {result['reads_per_s']:>7}  read p50 {result['read_p50_ms']:>7} ms  "
+              f"p99 {result['read_p99_ms']:>7} ms  logins/s {result['logins_per_s']:>6}  "
+              f"login mean {result['login_mean_ms']:>7} ms  rejected {result['logins_rejected']}")
+
+
+if __name__ == "__main__":
+    main()
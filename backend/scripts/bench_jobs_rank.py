@@ -0,0 +1,135 @@
+"""
+scripts/bench_jobs_rank.py
+
+Time JobsService ranking on synthetic scraped jobs (no network):
+
+    cd backend
+    python scripts/bench_jobs_rank.py --jobs 10000 --top 15
+
+Stages reported per run (median of --repeat runs):
+  normalize   raw jobspy-style DataFrame -> normalized jobs frame
+  features    job x feature matrix (skills, title, level, location)
+  score       matrix @ weights, rounded as JobRanker.rank does
+  select      top-N by argpartition, vs. a full stable sort of every row
+  rank        JobRanker.rank as a whole (dedupe, features, score, select)
+  to_dicts    top-N rows -> API dicts (skill extraction included)
+  baseline    the ranking this replaced: a weighted sum per dimension and a
+              full stable sort of every row, then the top-N (same matcher)
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+
+import pandas as pd
+
+from src.job_api import frame_to_jobs, normalize_jobs_frame
+
+WORDS = (
+    "python java javascript typescript sql postgres react node.js aws docker kubernetes "
+    "machine learning data pipelines spark airflow team product build scale ship own "
+    "customers platform services api design review mentor agile cloud security"
+).split()
+TITLES = [
+    "Senior Python Developer", "Junior Data Analyst", "Lead Engineer", "Software Engineer",
+    "ML Intern", "Associate Java Developer", "Staff SRE", "Backend Developer (Node.js)",
+    "Data Scientist", "Principal Architect", "Graduate Trainee", "Full Stack Engineer",
+]
+LOCATIONS = ["Bengaluru, Karnataka, India", "Pune, India", "Hyderabad, India", "Remote", "London, UK", None]
+
+
+def synthetic_jobs(n: int, seed: int = 7) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    return pd.DataFrame({
+        "title": [f"{rnd.choice(TITLES)} {i % 97}" for i in range(n)],
+        "company": [f"Company {rnd.randrange(n // 4 or 1)}" for _ in range(n)],
+        "location": [rnd.choice(LOCATIONS) for _ in range(n)],
+        "job_url": [f"https://jobs.example.com/{i}" for i in range(n)],
+        "description": [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(40, 250))) for _ in range(n)],
+        "job_type": [rnd.choice(["fulltime", "contract", "internship", None]) for _ in range(n)],
+        "is_remote": [rnd.random() < 0.2 for _ in range(n)],
+        "min_amount": [rnd.choice([None, 400000.0, 900000.0, 1800000.0]) for _ in range(n)],
+        "max_amount": [rnd.choice([None, 1200000.0, 2500000.0]) for _ in range(n)],
+        "interval": [rnd.choice(["yearly", "monthly", None]) for _ in range(n)],
+    })
+
+
+def baseline_rank(frame: pd.DataFrame, skills: list[str], levels: list[str], location: str, top: int) -> pd.DataFrame:
+    """The previous JobsService ranking: dedupe, score column by column, sort every row."""
+    from app.services.jobs import _level_scores, _location_scores, _skill_scores, _title_scores
+    from src.skill_match import skill_matcher
+
+    keys = pd.DataFrame({"title": frame["_title_lower"], "company": frame["company"].str.lower()})
+    frame = frame.loc[~keys.duplicated()].reset_index(drop=True)
+    matcher = skill_matcher(tuple(skills))
+    scores = (
+        0.40 * _skill_scores(frame, skills, matcher)
+        + 0.30 * _title_scores(frame, skills, matcher)
+        + 0.20 * _level_scores(frame, levels)
+        + 0.10 * _location_scores(frame, location)
+    )
+    ranked = frame.assign(_score=scores).sort_values("_score", ascending=False, kind="stable").reset_index(drop=True)
+    return ranked.head(top)
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skills", default="Python,SQL,Machine Learning,Docker,React")
+    args = parser.parse_args()
+
+    from app.services.jobs import _top_n, jobs_service
+
+    ranker = jobs_service.ranker
+    skills = [s.strip() for s in args.skills.split(",") if s.strip()]
+    levels, location = ["intermediate"], "India"
+    raw = synthetic_jobs(args.jobs)
+
+    timings: dict[str, list[float]] = {}
+    for _ in range(args.repeat):
+        frame, t = _timed(lambda: normalize_jobs_frame(raw, "LinkedIn"))
+        timings.setdefault("normalize", []).append(t)
+        features, t = _timed(lambda: ranker.features(frame, skills, levels, location))
+        timings.setdefault("features", []).append(t)
+        scores, t = _timed(lambda: (features @ ranker.weights).round(9))
+        timings.setdefault("score", []).append(t)
+        best, t = _timed(lambda: _top_n(scores, args.top))
+        timings.setdefault("select (argpartition)", []).append(t)
+        sorted_rows, t = _timed(lambda: frame.assign(_score=scores).sort_values("_score", ascending=False, kind="stable").head(args.top))
+        timings.setdefault("select (full sort)", []).append(t)
+        ranked, t = _timed(lambda: ranker.rank(frame, skills, levels, location, args.top))
+        timings.setdefault("rank", []).append(t)
+        _, t = _timed(lambda: frame_to_jobs(ranked, skills))
+        timings.setdefault("to_dicts", []).append(t)
+        _, t = _timed(lambda: baseline_rank(frame, skills, levels, location, args.top))
+        timings.setdefault("baseline rank (full sort)", []).append(t)
+
+        if list(frame.index[best]) != list(sorted_rows.index):
+            sys.exit("argpartition selection disagrees with the full sort")
+
+    print(f"{args.jobs} jobs, top {args.top}, {len(skills)} skills, weights {ranker.stats()}")
+    for stage, values in timings.items():
+        print(f"  {stage:<30} {statistics.median(values) * 1000:>9.2f} ms")
+    for label, rank_stage in (("ranked top-N end to end", "rank"), ("baseline end to end", "baseline rank (full sort)")):
+        end_to_end = sum(statistics.median(timings[s]) for s in ("normalize", rank_stage, "to_dicts"))
+        print(f"  {label:<30} {end_to_end * 1000:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+scripts/bench_sqlite.py
+
+Read throughput of the roadmap detail query while other threads run the
+mark-node write path (progress upsert + counter update + commit), for the
+"default" and "production" SQLite profiles in app/database.py.
+
+Runs against a throwaway database file, never roadmap_app.db:
+
+    cd backend
+    python scripts/bench_sqlite.py --readers 8 --writers 2 --seconds 10
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, DB_POOL_SIZE, DB_MAX_OVERFLOW, _set_sqlite_pragmas
+from app.models import ComprehensiveRoadmap, User
+from app.services.progress import completed_node_ids, refresh_counters, set_node_progress
+
+NODES_PER_ROADMAP = 40
+
+
+def make_session_factory(path: str, profile: str):
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+    )
+    if profile == "production":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed(Session, roadmaps: int) -> list[int]:
+    db = Session()
+    try:
+        user = User(email="bench@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        nodes = [{"id": f"n{i}", "text": f"Topic {i}", "completed": False, "varName": f"n{i}"}
+                 for i in range(NODES_PER_ROADMAP)]
+        rows = [
+            ComprehensiveRoadmap(
+                user_id=user.id, skill=f"skill {i}", timeframe="4 weeks",
+                current_knowledge="none", target_level="intermediate",
+                content={"mermaid": "", "descriptions": {}}, nodes=nodes, edges=[],
+                node_desc={n["id"]: "x" * 400 for n in nodes}, marked_nodes=[],
+                total_nodes=len(nodes), completed_nodes=0, is_completed=False
+            )
+            for i in range(roadmaps)
+        ]
+        db.add_all(rows)
+        db.commit()
+        return [r.id for r in rows]
+    finally:
+        db.close()
+
+
+def run(profile: str, readers: int, writers: int, seconds: float, roadmaps: int) -> dict:
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine, Session = make_session_factory(path, profile)
+    ids = seed(Session, roadmaps)
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def reader():
+        done = 0
+        while not stop.is_set():
+            db = Session()
+            try:
+                roadmap_id = random.choice(ids)
+                roadmap = db.get(ComprehensiveRoadmap, roadmap_id)
+                completed_node_ids(db, [roadmap_id])
+                _ = roadmap.nodes, roadmap.node_desc
+                done += 1
+            except Exception:
+                with lock:
+                    counts["errors"] += 1
+            finally:
+                db.close()
+        with lock:
+            counts["reads"] += done
+
+    def writer():
+        done = 0
+        while not stop.is_set():
+            db = Session()
+            try:
+                roadmap = db.get(ComprehensiveRoadmap, random.choice(ids))
+                set_node_progress(db, roadmap.id, f"n{random.randrange(NODES_PER_ROADMAP)}", random.random() < 0.7)
+                refresh_counters(db, roadmap)
+                db.commit()
+                done += 1
+            except Exception:
+                db.rollback()
+                with lock:
+                    counts["errors"] += 1
+            finally:
+                db.close()
+        with lock:
+            counts["writes"] += done
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    return {
+        "profile": profile,
+        "reads_per_s": round(counts["reads"] / seconds, 1),
+        "writes_per_s": round(counts["writes"] / seconds, 1),
+        "errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--roadmaps", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} mark-node writers, {args.seconds}s per profile")
+    for profile in ("default", "production"):
+        result = run(profile, args.readers, args.writers, args.seconds, args.roadmaps)
+        print(f"  {result['profile']:<10}  reads/s {result['reads_per_s']:>9}  "
+              f"writes/s {result['writes_per_s']:>8}  errors {result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
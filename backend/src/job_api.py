@@ -1,165 +1,187 @@
 """
 src/job_api.py
 Real job fetchers using python-jobspy — scrapes LinkedIn and Naukri.
-Returns a list of normalized dicts (one per job).
+
+The scraped DataFrame is normalized column-wise (null cleaning, lowercasing,
+seniority bucketing, salary strings, truncation) into a "jobs frame".
+Callers that rank jobs work on the frame and only turn their top-N rows into
+dicts; fetch_linkedin_jobs / fetch_naukri_jobs still return a list of
+normalized dicts (one per job).
 """
 from __future__ import annotations
 
-import re
 import traceback
-from typing import Any
+
+import numpy as np
+import pandas as pd
 
 # python-jobspy converts results to a pandas DataFrame
 from jobspy import scrape_jobs
 
+from src.skill_match import SkillMatcher, skill_matcher
 
-# ── helpers ──────────────────────────────────────────────────────────────────
-
-def _safe_str(val: Any, fallback: str = "") -> str:
-    if val is None:
-        return fallback
-    s = str(val).strip()
-    return fallback if s in ("nan", "None", "") else s
 
+# Public job fields, in output order; underscore columns are kept for scoring
+JOB_FIELDS = [
+    "source", "title", "company", "location", "job_url", "description",
+    "salary_range", "job_type", "level",
+]
+SCORING_COLUMNS = ["_full_description", "_title_lower", "_level_bucket"]
 
-def _build_salary(row: Any) -> str:
-    """Build a human-readable salary string from jobspy columns."""
-    try:
-        mn = row.get("min_amount") if hasattr(row, "get") else getattr(row, "min_amount", None)
-        mx = row.get("max_amount") if hasattr(row, "get") else getattr(row, "max_amount", None)
-        interval = _safe_str(row.get("interval") if hasattr(row, "get") else getattr(row, "interval", ""), "yearly")
-        currency = _safe_str(row.get("currency") if hasattr(row, "get") else getattr(row, "currency", ""), "INR")
-
-        if mn and str(mn) not in ("nan", "None", ""):
-            mn_f = float(mn)
-            mx_f = float(mx) if mx and str(mx) not in ("nan", "None") else mn_f
-            if interval.lower() == "yearly":
-                return f"₹{mn_f:,.0f} – ₹{mx_f:,.0f} / year"
-            elif interval.lower() == "monthly":
-                return f"₹{mn_f:,.0f} – ₹{mx_f:,.0f} / month"
-            else:
-                return f"₹{mn_f:,.0f} – ₹{mx_f:,.0f}"
-    except Exception:
-        pass
-    return "Salary not disclosed"
+_JOB_TYPES = {
+    "fulltime": "Full-time", "full_time": "Full-time", "full-time": "Full-time",
+    "parttime": "Part-time", "part_time": "Part-time", "part-time": "Part-time",
+    "contract": "Contract",
+    "internship": "Internship",
+    "remote": "Remote",
+}
+_SENIOR_WORDS = "senior|lead|principal|staff|architect"
+_ENTRY_WORDS = "junior|entry|associate|graduate|intern"
+_LEVEL_LABELS = {"senior": "Senior", "entry": "Entry-level", "mid": "Mid-level"}
+_DESCRIPTION_CHARS = 320
 
 
-def _normalize_job_type(jt: str) -> str:
-    mapping = {
-        "fulltime": "Full-time", "full_time": "Full-time", "full-time": "Full-time",
-        "parttime": "Part-time", "part_time": "Part-time", "part-time": "Part-time",
-        "contract": "Contract",
-        "internship": "Internship",
-        "remote": "Remote",
-    }
-    return mapping.get((jt or "").lower().replace(" ", ""), jt or "Full-time")
-
+# ── helpers ──────────────────────────────────────────────────────────────────
 
-def _extract_skills_from_description(desc: str, keywords: list[str]) -> list[str]:
-    """Simple keyword match against the job description to find relevant skills."""
-    if not desc:
-        return []
-    desc_lower = desc.lower()
-    found = []
-    for kw in keywords:
-        pattern = r'\b' + re.escape(kw.lower()) + r'\b'
-        if re.search(pattern, desc_lower):
-            found.append(kw)
-    return found
-
-
-def _row_to_dict(row, site: str, query_keywords: list[str]) -> dict:
-    """Convert a jobspy DataFrame row to our normalized job dict."""
-    if hasattr(row, "_asdict"):
-        r = row._asdict()
-    elif hasattr(row, "to_dict"):
-        r = row.to_dict()
-    else:
-        r = dict(row)
-
-    title = _safe_str(r.get("title"), "Untitled Role")
-    company = _safe_str(r.get("company"), "Unknown Company")
-    location = _safe_str(r.get("location") or f"{_safe_str(r.get('city'))} {_safe_str(r.get('state'))}".strip(), "")
-    job_url = _safe_str(r.get("job_url"), "")
-    description = _safe_str(r.get("description"), "")
-    job_type_raw = _safe_str(r.get("job_type", ""), "")
-    is_remote = r.get("is_remote", False)
-
-    job_type = "Remote" if is_remote else _normalize_job_type(job_type_raw)
-    salary = _build_salary(r)
+def _text(df: pd.DataFrame, column: str, fallback: str = "") -> pd.Series:
+    """Column as stripped strings; missing column, NaN/None and blanks become `fallback`."""
+    if column not in df:
+        return pd.Series(fallback, index=df.index, dtype=object)
+    values = df[column].astype(object).where(df[column].notna(), "").astype(str).str.strip()
+    return values.where(~values.isin(("", "nan", "None", "NaN", "<NA>")), fallback)
+
+
+def _salary(df: pd.DataFrame) -> pd.Series:
+    """Human-readable salary strings from the jobspy amount / interval columns."""
+    salary = pd.Series("Salary not disclosed", index=df.index, dtype=object)
+    if "min_amount" not in df:
+        return salary
+    low = pd.to_numeric(df["min_amount"], errors="coerce")
+    high = pd.to_numeric(df["max_amount"], errors="coerce") if "max_amount" in df else low
+    high = high.fillna(low)
+    known = low.notna() & (low != 0)
+    if not known.any():
+        return salary
+
+    interval = _text(df, "interval", "yearly").str.lower()
+    suffix = np.select(
+        [interval == "yearly", interval == "monthly"], [" / year", " / month"], default=""
+    )
+    amounts = (
+        "₹" + low[known].map("{:,.0f}".format) + " – ₹" + high[known].map("{:,.0f}".format)
+    )
+    salary[known] = amounts + pd.Series(suffix, index=df.index)[known]
+    return salary
+
+
+def normalize_jobs_frame(df: pd.DataFrame | None, site: str) -> pd.DataFrame:
+    """Turn a raw jobspy DataFrame into the normalized jobs frame (JOB_FIELDS + scoring columns)."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=JOB_FIELDS + SCORING_COLUMNS)
+    df = df.reset_index(drop=True)
+
+    title = _text(df, "title", "Untitled Role")
+    title_lower = title.str.lower()
+    description = _text(df, "description")
+
+    location = _text(df, "location")
+    city_state = (_text(df, "city") + " " + _text(df, "state")).str.strip()
+    location = location.where(location != "", city_state)
+
+    job_type_raw = _text(df, "job_type")
+    job_type = job_type_raw.str.lower().str.replace(" ", "", regex=False).map(_JOB_TYPES)
+    job_type = job_type.fillna(job_type_raw).where(job_type_raw != "", "Full-time")
+    if "is_remote" in df:
+        remote = df["is_remote"].astype(object).where(df["is_remote"].notna(), False).astype(bool)
+        job_type = job_type.where(~remote, "Remote")
 
     # Infer seniority from title
-    title_lower = title.lower()
-    if any(w in title_lower for w in ("senior", "lead", "principal", "staff", "architect")):
-        level = "Senior"
-    elif any(w in title_lower for w in ("junior", "entry", "associate", "graduate", "intern")):
-        level = "Entry-level"
-    else:
-        level = "Mid-level"
-
-    # Skills matched from description
-    required_skills = _extract_skills_from_description(description, query_keywords)
-    # Always include the raw search keywords if nothing found
-    if not required_skills:
-        required_skills = query_keywords[:3]
+    bucket = np.select(
+        [title_lower.str.contains(_SENIOR_WORDS, regex=True),
+         title_lower.str.contains(_ENTRY_WORDS, regex=True)],
+        ["senior", "entry"], default="mid"
+    )
+    bucket = pd.Series(bucket, index=df.index, dtype=object)
 
     # Trim description
-    short_desc = (description[:320] + "…") if len(description) > 320 else description
+    long = description.str.len() > _DESCRIPTION_CHARS
+    short_desc = description.where(~long, description.str.slice(0, _DESCRIPTION_CHARS) + "…")
 
-    return {
+    return pd.DataFrame({
         "source": site,
         "title": title,
-        "company": company,
+        "company": _text(df, "company", "Unknown Company"),
         "location": location,
-        "job_url": job_url,
+        "job_url": _text(df, "job_url"),
         "description": short_desc,
-        "required_skills": required_skills,
-        "salary_range": salary,
+        "salary_range": _salary(df),
         "job_type": job_type,
-        "level": level,
+        "level": bucket.map(_LEVEL_LABELS),
         # Raw for scoring
-        "_full_description": description.lower(),
+        "_full_description": description.str.lower(),
         "_title_lower": title_lower,
-    }
+        "_level_bucket": bucket,
+    })
+
+
+def _extract_skills_from_description(desc: str, keywords: list[str] | SkillMatcher) -> list[str]:
+    """Simple keyword match against the job description to find relevant skills."""
+    if not desc:
+        return []
+    matcher = keywords if isinstance(keywords, SkillMatcher) else skill_matcher(tuple(keywords))
+    return matcher.matches(desc)
+
+
+def frame_to_jobs(frame: pd.DataFrame, query_keywords: list[str], scoring_fields: bool = False) -> list[dict]:
+    """
+    Build the job dicts for (already selected) rows of a jobs frame.
+    Skill extraction happens here, so it only runs for rows actually returned.
+    """
+    if frame.empty:
+        return []
+    matcher = skill_matcher(tuple(query_keywords))
+    columns = JOB_FIELDS + (SCORING_COLUMNS if scoring_fields else [])
+    jobs = frame[columns].to_dict("records")
+    for job, description in zip(jobs, frame["_full_description"]):
+        # Skills matched from description; always include the raw search keywords if nothing found
+        job["required_skills"] = _extract_skills_from_description(description, matcher) or query_keywords[:3]
+    return jobs
 
 
 # ── public API ────────────────────────────────────────────────────────────────
 
-def fetch_linkedin_jobs(keywords: list[str], location: str = "India", max_results: int = 15) -> list[dict]:
-    """Scrape LinkedIn for jobs matching any of the given keywords."""
+def _scrape_frame(site_name: str, label: str, keywords: list[str], location: str, max_results: int) -> pd.DataFrame:
     query = " OR ".join(keywords) if len(keywords) > 1 else keywords[0]
     try:
         df = scrape_jobs(
-            site_name=["linkedin"],
+            site_name=[site_name],
             search_term=query,
             location=location,
             results_wanted=max_results,
             hours_old=72,
             verbose=0,
         )
-        if df is None or df.empty:
-            return []
-        return [_row_to_dict(row, "LinkedIn", keywords) for _, row in df.iterrows()]
+        return normalize_jobs_frame(df, label)
     except Exception:
         traceback.print_exc()
-        return []
+        return normalize_jobs_frame(None, label)
+
+
+def fetch_linkedin_frame(keywords: list[str], location: str = "India", max_results: int = 15) -> pd.DataFrame:
+    """Scrape LinkedIn into a normalized jobs frame."""
+    return _scrape_frame("linkedin", "LinkedIn", keywords, location, max_results)
+
+
+def fetch_naukri_frame(keywords: list[str], location: str = "India", max_results: int = 15) -> pd.DataFrame:
+    """Scrape Naukri into a normalized jobs frame."""
+    return _scrape_frame("naukri", "Naukri", keywords, location, max_results)
+
+
+def fetch_linkedin_jobs(keywords: list[str], location: str = "India", max_results: int = 15) -> list[dict]:
+    """Scrape LinkedIn for jobs matching any of the given keywords."""
+    return frame_to_jobs(fetch_linkedin_frame(keywords, location, max_results), keywords)
 
 
 def fetch_naukri_jobs(keywords: list[str], location: str = "India", max_results: int = 15) -> list[dict]:
     """Scrape Naukri for jobs matching any of the given keywords."""
-    query = " OR ".join(keywords) if len(keywords) > 1 else keywords[0]
-    try:
-        df = scrape_jobs(
-            site_name=["naukri"],
-            search_term=query,
-            location=location,
-            results_wanted=max_results,
-            hours_old=72,
-            verbose=0,
-        )
-        if df is None or df.empty:
-            return []
-        return [_row_to_dict(row, "Naukri", keywords) for _, row in df.iterrows()]
-    except Exception:
-        traceback.print_exc()
-        return []
+    return frame_to_jobs(fetch_naukri_frame(keywords, location, max_results), keywords)
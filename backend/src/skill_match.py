@@ -0,0 +1,72 @@
+"""
+src/skill_match.py
+One-pass keyword matcher shared by job skill extraction (src/job_api.py)
+and job ranking (app/services/jobs.py).
+
+Equivalent to running `re.search(r'\b' + re.escape(kw) + r'\b', text)` for
+every keyword, but all keywords are compiled into a single alternation that
+is scanned once per document:
+  - the alternation sits in a zero-width lookahead, so matches that overlap
+    ("machine learning" / "learning systems") are all seen
+  - two keywords can only match at the same position if one is a prefix of
+    the other ("java" / "javascript"); those go into separate alternations,
+    so in practice there is a single pattern
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+
+class SkillMatcher:
+    """Finds which of a fixed list of keywords occur in a text (case-insensitive, whole words)."""
+
+    def __init__(self, keywords: list[str] | tuple[str, ...]):
+        self.keywords = list(keywords)
+        # lowercase keyword -> indices into self.keywords (duplicates share one alternative)
+        self._index: dict[str, list[int]] = {}
+        for i, kw in enumerate(self.keywords):
+            kw_lower = kw.strip().lower()
+            if kw_lower:
+                self._index.setdefault(kw_lower, []).append(i)
+
+        groups: list[list[str]] = []
+        for kw_lower in sorted(self._index, key=len, reverse=True):
+            for group in groups:
+                if not any(other.startswith(kw_lower) for other in group):
+                    group.append(kw_lower)
+                    break
+            else:
+                groups.append([kw_lower])
+        self._patterns = [
+            re.compile(r'\b(?=(' + "|".join(re.escape(kw) for kw in group) + r')\b)')
+            for group in groups
+        ]
+
+    def found(self, text: str) -> set[int]:
+        """Indices of the keywords present in `text`."""
+        if not text or not self._patterns:
+            return set()
+        text = text.lower()
+        hits: set[int] = set()
+        for pattern in self._patterns:
+            for kw_lower in set(pattern.findall(text)):
+                hits.update(self._index[kw_lower])
+        return hits
+
+    def count(self, text: str) -> int:
+        """How many of the keywords occur in `text`."""
+        return len(self.found(text))
+
+    def matches(self, text: str) -> list[str]:
+        """The keywords present in `text`, in keyword order."""
+        return [self.keywords[i] for i in sorted(self.found(text))]
+
+    def __bool__(self) -> bool:
+        return bool(self._patterns)
+
+
+@lru_cache(maxsize=256)
+def skill_matcher(keywords: tuple[str, ...]) -> SkillMatcher:
+    """Shared, cached matcher for a query's keywords (pass a tuple)."""
+    return SkillMatcher(keywords)
@@ -35,8 +35,8 @@ export function Auth() {
       const loginResponse = await api.post('/auth/login', loginData, { headers: { 'Content-Type': 'application/x-www-form-urlencoded' } });
 
       if (loginResponse.data) {
-        const { access_token } = loginResponse.data;
-        setToken(access_token);
+        const { access_token, refresh_token } = loginResponse.data;
+        setToken(access_token, refresh_token);
         localStorage.setItem('token', access_token);
         api.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
         const userResponse = await api.get('/auth/me');
@@ -10,6 +10,7 @@ const inputCls = 'w-full rounded-xl border border-midnight/10 bg-sage/40 px-4 py
 export function Profile() {
     const user = useAuthStore((state) => state.user);
     const signOut = useAuthStore((state) => state.signOut);
+    const setToken = useAuthStore((state) => state.setToken);
     const clearRoadmapData = useRoadmapStore((state) => state.clearRoadmapData);
     const roadmaps = useRoadmapStore((state) => state.roadmaps);
     const navigate = useNavigate();
@@ -33,7 +34,9 @@ export function Profile() {
         if (newPassword.length < 5) { setPwError('Password must be at least 5 characters.'); return; }
         setPwLoading(true);
         try {
-            await api.post('/auth/change-password', { current_password: currentPassword, new_password: newPassword });
+            const { data } = await api.post('/auth/change-password', { current_password: currentPassword, new_password: newPassword });
+            // Other sessions were revoked; keep this one going with the new pair
+            if (data?.access_token) setToken(data.access_token, data.refresh_token);
             setPwSuccess('Password updated successfully!');
             setCurrentPassword(''); setNewPassword(''); setConfirmPassword('');
         } catch (err) {
@@ -10,6 +10,46 @@ const api = axios.create({
   }
 });
 
+// One refresh at a time; concurrent 401s wait on the same promise
+let refreshPromise = null;
+
+// Tabs share the tokens in localStorage. The Web Lock makes them rotate one at
+// a time, and a tab that waited for it picks up the pair the other tab stored
+const REFRESH_LOCK = 'learnwise-token-refresh';
+const withRefreshLock = (fn) =>
+  navigator.locks ? navigator.locks.request(REFRESH_LOCK, fn) : Promise.resolve().then(fn);
+
+const refreshAccessToken = () => {
+  if (!refreshPromise) {
+    const seenRefreshToken = localStorage.getItem('refresh_token');
+    refreshPromise = withRefreshLock(() => {
+      const refreshToken = localStorage.getItem('refresh_token');
+      if (!refreshToken) {
+        return Promise.reject(new Error('No refresh token'));
+      }
+      if (refreshToken !== seenRefreshToken) {
+        // Another tab rotated the tokens while this one waited
+        const token = localStorage.getItem('token');
+        useAuthStore.getState().setToken(token, refreshToken);
+        return token;
+      }
+      return axios.post(`${api.defaults.baseURL}/auth/refresh`, { refresh_token: refreshToken })
+        .then(({ data }) => {
+          useAuthStore.getState().setToken(data.access_token, data.refresh_token);
+          return data.access_token;
+        });
+    }).finally(() => {
+      refreshPromise = null;
+    });
+  }
+  return refreshPromise;
+};
+
+// A 401 from these means bad credentials or a dead session, not an expired
+// access token; every other endpoint (/auth/me, /auth/change-password, ...)
+// gets the refresh-and-replay
+const NO_REFRESH_URLS = new Set(['/auth/login', '/auth/signup', '/auth/refresh']);
+
 // Add request interceptor to handle auth and form data
 api.interceptors.request.use(
   (config) => {
@@ -42,10 +82,20 @@ api.interceptors.response.use(
       // Server responded with error status
       switch (error.response.status) {
         case 401:
-          // Unauthorized - clear auth state and redirect to login
-          if (!originalRequest._retry) {
-            useAuthStore.getState().signOut();
-            window.location.href = '/auth';
+          // Access token expired - renew it once and replay the request
+          if (!originalRequest._retry && !NO_REFRESH_URLS.has(originalRequest.url)) {
+            originalRequest._retry = true;
+            return refreshAccessToken()
+              .then((token) => {
+                originalRequest.headers.Authorization = `Bearer ${token}`;
+                return api(originalRequest);
+              })
+              .catch(() => {
+                // Refresh failed - clear auth state and redirect to login
+                useAuthStore.getState().signOut();
+                window.location.href = '/auth';
+                return Promise.reject(error);
+              });
           }
           break;
         case 422:
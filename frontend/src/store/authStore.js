@@ -5,22 +5,37 @@ import api from '../lib/axios';
 const authStore = (set) => ({
   user: null,
   token: null,
+  refreshToken: null,
   isAuthenticated: false,
 
   setUser: (user) => set({ user, isAuthenticated: !!user }),
 
-  setToken: (token) => {
+  // Access tokens are short-lived; the refresh token renews them (see lib/axios.js)
+  setToken: (token, refreshToken) => {
     if (token) {
       localStorage.setItem('token', token);
       api.defaults.headers.common['Authorization'] = `Bearer ${token}`;
     }
-    set({ token, isAuthenticated: !!token });
+    if (refreshToken) {
+      localStorage.setItem('refresh_token', refreshToken);
+    }
+    set((state) => ({
+      token,
+      refreshToken: refreshToken || state.refreshToken,
+      isAuthenticated: !!token,
+    }));
   },
 
   signOut: () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+      // Best effort: revoke the session server-side
+      api.post('/auth/logout', { refresh_token: refreshToken }).catch(() => {});
+    }
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     delete api.defaults.headers.common['Authorization'];
-    set({ user: null, token: null, isAuthenticated: false });
+    set({ user: null, token: null, refreshToken: null, isAuthenticated: false });
   },
 });
 
@@ -29,6 +44,7 @@ export const useAuthStore = create(
     name: 'auth-storage',
     partialize: (state) => ({
       token: state.token,
+      refreshToken: state.refreshToken,
       user: state.user,
       isAuthenticated: state.isAuthenticated,
     }),